@@ -1,12 +1,15 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import logging
 from pathlib import Path
+from typing import Literal
 
 import yt_dlp
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 ENV_PATH = BASE_DIR / ".env"
 DB_PATH = BASE_DIR / "sync_me.db"
+# native falls back to ytdlp for streams it can't handle
+DownloadBackend = Literal["ytdlp", "native"]
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -20,13 +23,59 @@ class Settings(BaseSettings):
     http_proxy: str | None = None
     soundcloud_oauth: str = ""  # can be set via API or load via .env
     concurrent_downloads: int = 4  # 4–16 depending on your bandwidth
+    # adjusts concurrent_downloads at runtime within the bounds below
+    download_autotune: bool = False
+    download_autotune_min: int = 2
+    download_autotune_max: int = 16
+    download_autotune_interval: float = 15.0  # seconds per measuring window
     concurrent_fragment_downloads: int = 1  # 4–16 depending on your bandwidth
     download_folder: str = str(BASE_DIR / "musics")
     file_template: str = "%(title)s.%(ext)s"
+    # "sharded" keeps one content-addressed copy per file and links tracks to it,
+    # "flat" names files by file_template directly in download_folder
+    storage_layout: str = "sharded"
     download_retries: int = 4
+    download_retry_backoff_base: float = 30.0  # seconds before the first retry
+    download_retry_backoff_max: float = 60.0 * 60  # seconds
+    # finished downloads kept in the progress streams, older ones are in the DB
+    progress_finished_ttl: float = 5.0 * 60  # seconds
+    progress_finished_max: int = 1000
     sync_interval: int = 30
     stream_chunk_size: int = 1024 * 1024  # 1 MB in bytes
     frontend_path: str = str(BASE_DIR / "static/frontend/")
+    http_connection_limit: int = 100
+    http_connection_limit_per_host: int = 16
+    http_dns_cache_ttl: int = 300  # seconds
+    http_keepalive_timeout: int = 60  # seconds
+    soundcloud_auth_ttl: int = 60 * 60  # client_id/app_version lifetime in seconds
+    soundcloud_api_url: str = "https://api-v2.soundcloud.com"
+    soundcloud_rate_limit: float = 8.0  # requests per second, upper bound
+    soundcloud_rate_limit_min: float = 0.5  # lowest rate after repeated 429s
+    soundcloud_rate_burst: int = 8
+    soundcloud_max_retries: int = 4  # retries on 429/5xx
+    soundcloud_backoff_base: float = 1.0  # seconds
+    soundcloud_backoff_max: float = 60.0  # seconds
+    http_cache_path: str = str(BASE_DIR / "http_cache.db")
+    http_cache_max_bytes: int = 256 * 1024 * 1024  # 256 MB
+    # seconds per api-v2 endpoint, 0 stores for revalidation only, absent skips
+    http_cache_ttls: dict[str, int] = {
+        "/tracks": 7 * 24 * 60 * 60,
+        "/playlists/{id}": 0,
+    }
+    tracks_batch_size: int = 29  # max ids per `/tracks?ids=` request
+    tracks_batch_concurrency: int = 4  # in-flight `/tracks?ids=` requests
+    tracks_batch_retries: int = 2
+    liked_tracks_page_size: int = 200
+    library_page_size: int = 50
+    playlist_fallback_concurrency: int = 4  # in-flight `/playlists/{id}` lookups
+    download_backend: DownloadBackend = "ytdlp"
+    download_processes: int = 0  # >0 runs yt-dlp in that many worker processes
+    bandwidth_limit: int = 0  # bytes/s shared by all downloads, 0 is unlimited
+    # {"HH:MM-HH:MM": bytes/s} overrides bandwidth_limit, first match wins
+    bandwidth_schedule: dict[str, int] = {}
+    bandwidth_burst: float = 0.5  # seconds of budget a transfer may run ahead
+    ytdl_info_ttl: int = 5 * 60  # seconds extracted media info is reused by retries
+    ytdl_info_cache_size: int = 256
 
     db_url: str = f"sqlite:///{DB_PATH}"
 
@@ -1,8 +1,15 @@
+from collections.abc import Callable
+from datetime import datetime
+
+from sqlalchemy import Connection, Table, inspect, text
 from sqlmodel import Session, create_engine, SQLModel
 from app.core.config import settings
+from app.core.logging import get_logger
 from typing import Annotated
 from fastapi import Depends
 
+logger = get_logger(__name__)
+
 connect_args = {"check_same_thread": False}
 engine = create_engine(settings.db_url, connect_args=connect_args)
 
@@ -12,8 +19,55 @@ def get_session():
         yield session
 
 
+def backfill_next_attempt_at(connection: Connection, table: Table) -> None:
+    # downloads that failed before retries were persisted get one scheduled now
+    result = connection.execute(
+        table.update()
+        .where(
+            table.c.status == "FAILED",
+            table.c.attempts < settings.download_retries,
+        )
+        .values(next_attempt_at=datetime.now())
+    )
+    logger.info("scheduled retries for %d failed downloads", result.rowcount)
+
+
+# run once, right after the column is added
+BACKFILLS: dict[tuple[str, str], Callable[[Connection, Table], None]] = {
+    ("downloadtrackmodel", "next_attempt_at"): backfill_next_attempt_at,
+}
+
+
+def add_missing_columns():
+    """`create_all` never alters existing tables, so add columns introduced later"""
+    inspector = inspect(engine)
+    backfills = []
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"  # type: ignore
+                logger.info("add missing column %s.%s", table.name, column.name)
+                connection.execute(text(ddl))
+                backfill = BACKFILLS.get((table.name, column.name))
+                if backfill:
+                    backfills.append((backfill, table))
+        for backfill, table in backfills:
+            backfill(connection, table)
+
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
 
 
 SessionDep = Annotated[Session, Depends(get_session)]
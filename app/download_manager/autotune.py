@@ -0,0 +1,155 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# an added slot has to bring at least this share of a slot's throughput
+MIN_MARGINAL_GAIN = 0.5
+# failed share of the finished downloads in a window that forces a step down
+MAX_ERROR_RATE = 0.25
+# windows to wait before probing upwards again after a step down
+HOLD_WINDOWS = 6
+
+
+@dataclass
+class AutotuneDecision:
+    at: float
+    limit_from: int
+    limit_to: int
+    throughput: float
+    per_slot: float
+    error_rate: float
+    reason: str
+
+
+@dataclass
+class AutotuneStats:
+    limit: int
+    min_limit: int
+    max_limit: int
+    throughput: float = 0.0  # bytes/s over the last window
+    per_slot: float = 0.0
+    mean_latency: float = 0.0  # seconds per finished download, last window
+    error_rate: float = 0.0
+    windows: int = 0
+    increases: int = 0
+    decreases: int = 0
+    decisions: deque[AutotuneDecision] = field(default_factory=lambda: deque(maxlen=50))
+
+
+class ConcurrencyAutotuner:
+    """Hill-climbs the download slot count on measured throughput
+
+    Adds a slot while every slot is busy and the queue isn't empty, and
+    steps back when the last added slot didn't pay for itself or too many
+    downloads failed.
+    """
+
+    def __init__(self, limit: int, min_limit: int, max_limit: int) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.stats = AutotuneStats(
+            limit=limit, min_limit=min_limit, max_limit=max_limit
+        )
+        self._finished_bytes = 0
+        self._window_total = 0
+        self._window_started = time.monotonic()
+        self._finished = 0
+        self._failed = 0
+        self._latency = 0.0
+        self._previous_throughput: float | None = None
+        self._previous_per_slot = 0.0
+        self._last_step = 0
+        self._hold = 0
+
+    def record_finished(
+        self, downloaded_bytes: int, seconds: float, ok: bool, cancelled: bool
+    ) -> None:
+        self._finished_bytes += downloaded_bytes
+        if cancelled:
+            return
+        self._finished += 1
+        self._failed += not ok
+        self._latency += seconds
+
+    def decide(
+        self, limit: int, running: int, running_bytes: int, backlog: bool
+    ) -> int:
+        """New slot limit after a window
+
+        `running_bytes` is what the running downloads transferred so far.
+        """
+        now = time.monotonic()
+        total = self._finished_bytes + running_bytes
+        elapsed = max(now - self._window_started, 1e-6)
+        throughput = max(total - self._window_total, 0) / elapsed
+        finished, failed, latency = self._finished, self._failed, self._latency
+        self._window_total, self._window_started = total, now
+        self._finished = self._failed = 0
+        self._latency = 0.0
+
+        self.stats.limit = limit
+        self.stats.throughput = throughput
+        self.stats.error_rate = failed / finished if finished else 0.0
+        self.stats.mean_latency = latency / finished if finished else 0.0
+        if not running and not finished:
+            # nothing to learn from an idle window
+            self._previous_throughput = None
+            self._last_step = 0
+            return limit
+
+        self.stats.windows += 1
+        per_slot = throughput / max(running, 1)
+        self.stats.per_slot = per_slot
+        step, reason = 0, ""
+        if self._hold:
+            self._hold -= 1
+        if finished and self.stats.error_rate > MAX_ERROR_RATE:
+            step, reason = -1, "errors"
+        elif (
+            self._last_step > 0
+            and self._previous_throughput is not None
+            and throughput - self._previous_throughput
+            < self._previous_per_slot * MIN_MARGINAL_GAIN * self._last_step
+        ):
+            step, reason = -self._last_step, "added slot didn't pay off"
+        elif backlog and running >= limit and not self._hold:
+            step, reason = 1, "all slots busy"
+
+        new_limit = min(max(limit + step, self.min_limit), self.max_limit)
+        if step < 0:
+            self._hold = HOLD_WINDOWS
+        self._last_step = new_limit - limit
+        self._previous_throughput = throughput
+        self._previous_per_slot = per_slot
+        if new_limit == limit:
+            return limit
+
+        if new_limit > limit:
+            self.stats.increases += 1
+        else:
+            self.stats.decreases += 1
+        self.stats.limit = new_limit
+        self.stats.decisions.append(
+            AutotuneDecision(
+                at=time.time(),
+                limit_from=limit,
+                limit_to=new_limit,
+                throughput=throughput,
+                per_slot=per_slot,
+                error_rate=self.stats.error_rate,
+                reason=reason,
+            )
+        )
+        logger.info(
+            "autotune concurrent downloads %d -> %d (%s) %.0f B/s, %.0f B/s per slot",
+            limit,
+            new_limit,
+            reason,
+            throughput,
+            per_slot,
+        )
+        return new_limit
@@ -1,100 +1,156 @@
-from asyncio import Queue, Condition
 import asyncio
+from collections import deque
 from dataclasses import dataclass
 import threading
-from types import CoroutineType
+import time
+from typing import Callable, Coroutine
 
 from app.core.logging import get_logger
+from app.download_manager.autotune import ConcurrencyAutotuner
+from app.download_manager.scheduler import (
+    PRIORITY_PLAY_NOW,
+    PRIORITY_PLAYLIST,
+    DownloadScheduler,
+    QueueItem,
+)
+from app.download_manager.progress import ProgressStore
 from app.models.playlist import DownloadStatusEnum
-from pydantic import BaseModel, ConfigDict
 logger = get_logger(__name__)
 
 
 @dataclass
 class DownloadContext:
-    progress_reports: dict
+    progress: ProgressStore
     cancel_event: threading.Event
-    progress_event: asyncio.Event
     download_track_id: int
     file_path: str | None = None
+    # written by progress hooks, read by the autotuner
+    downloaded_bytes: int = 0
+    started_at: float = 0.0
 
 
-class DownloadProgressReport(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
-    track_id: int = -1
-    percent: int = 0
-    status: DownloadStatusEnum = DownloadStatusEnum.DOWNLOADING
-
-
-def update_progress_reports(
-    progress_reports: dict[int, DownloadProgressReport],
-    download_id,
-    track_id: int,
-    percent: int = 0,
-    status: DownloadStatusEnum | None = None,
-):
-
-    current_report = progress_reports.get(
-        download_id,
-        DownloadProgressReport(track_id=track_id),
-    )
-    current_report.percent = max(current_report.percent, int(percent))
-    if status:
-        current_report.status = status
-    progress_reports[download_id] = current_report
+class AdjustableSemaphore:
+    """Semaphore whose limit can change at runtime
 
+    Waiters are woken one per free slot in FIFO order, a release never
+    wakes every waiter just to have all but one go back to sleep.
+    """
 
-class AdjustableSemaphore:
     def __init__(self, total_limit: int) -> None:
         self.total_limit = total_limit
         self.total_tasks = 0
-        self._condition = Condition()
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _wake_up(self):
+        while self._waiters and self.total_tasks < self.total_limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            # the slot is handed over, the waiter doesn't compete again
+            self.total_tasks += 1
+            waiter.set_result(None)
 
     async def acquire(self):
-        async with self._condition:
-            while self.total_tasks >= self.total_limit:
-                await self._condition.wait()
+        if not self._waiters and self.total_tasks < self.total_limit:
             self.total_tasks += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            else:
+                # woken and cancelled at the same time, give the slot back
+                self.total_tasks -= 1
+                self._wake_up()
+            raise
 
     async def release(self):
-        async with self._condition:
-            self.total_tasks -= 1
-            self._condition.notify_all()
+        self.total_tasks -= 1
+        self._wake_up()
 
     async def update_limit(self, new_limit):
-        async with self._condition:
-            logger.info(
-                "update semaphore limit from %d to %d", self.total_limit, new_limit
-            )
-            self.total_limit = new_limit
-            self._condition.notify_all()
+        logger.info("update semaphore limit from %d to %d", self.total_limit, new_limit)
+        self.total_limit = new_limit
+        self._wake_up()
+
+
+DownloadRunner = Callable[[DownloadContext], Coroutine]
 
 
 class DownloadManager:
-    def __init__(self, total_concurrent_downloads: int) -> None:
+    def __init__(self, total_concurrent_downloads: int, runner: DownloadRunner) -> None:
         self.semaphore = AdjustableSemaphore(total_concurrent_downloads)
-        self.queue = Queue()
-        self.tasks: dict[int, tuple[asyncio.Task, threading.Event]] = {}
-        self.progress_reports: dict[int, DownloadProgressReport] = {}
-        self.progress_event = asyncio.Event()
+        self.queue = DownloadScheduler()
+        self.runner = runner
+        self.tasks: dict[int, tuple[asyncio.Task, DownloadContext]] = {}
+        self.progress = ProgressStore()
+        self.autotuner: ConcurrencyAutotuner | None = None
+
+    async def autotune(self, min_limit: int, max_limit: int, interval: float):
+        """Let `ConcurrencyAutotuner` drive the semaphore limit"""
+        self.autotuner = ConcurrencyAutotuner(
+            self.semaphore.total_limit, min_limit, max_limit
+        )
+        while True:
+            await asyncio.sleep(interval)
+            running = [ctx for _, ctx in self.tasks.values()]
+            new_limit = self.autotuner.decide(
+                self.semaphore.total_limit,
+                running=len(running),
+                running_bytes=sum(ctx.downloaded_bytes for ctx in running),
+                backlog=len(self.queue) > 0,
+            )
+            if new_limit != self.semaphore.total_limit:
+                await self.semaphore.update_limit(new_limit)
 
     async def worker(self):
         while True:
-            (
-                download_id,
-                download_task,
-                cancel_event,
-                priority,
-            ) = await self.queue.get()
-            task = asyncio.create_task(
-                self.task_runner(
-                    download_task,
-                )
+            # take an item only once a slot is free, so only
+            # `concurrent_downloads` tasks exist however long the queue is
+            await self.semaphore.acquire()
+            try:
+                item = await self.queue.get()
+            except BaseException:
+                await self.semaphore.release()
+                raise
+            self.start(item)
+
+    def start(self, item: QueueItem):
+        ctx = DownloadContext(
+            progress=self.progress,
+            cancel_event=threading.Event(),
+            download_track_id=item.download_id,
+            started_at=time.monotonic(),
+        )
+        task = asyncio.create_task(self.task_runner(self.runner(ctx), ctx))
+        self.tasks[item.download_id] = (task, ctx)
+        task.add_done_callback(
+            lambda done, download_id=item.download_id: self.forget_task(
+                download_id, done
             )
-            self.tasks[download_id] = (task, cancel_event)
+        )
 
-    async def task_runner(self, task: asyncio.Task):
-        await self.semaphore.acquire()
+    def forget_task(self, download_id: int, task: asyncio.Task):
+        # a retry can already have replaced the entry with a new task
+        current, ctx = self.tasks.get(download_id, (None, None))
+        if current is not task or not ctx:
+            return
+        del self.tasks[download_id]
+        if self.autotuner:
+            # its bytes move from the running to the finished total here
+            report = self.progress.get(download_id)
+            self.autotuner.record_finished(
+                ctx.downloaded_bytes,
+                time.monotonic() - ctx.started_at,
+                ok=bool(report and report.status == DownloadStatusEnum.SUCCESSFUL),
+                cancelled=ctx.cancel_event.is_set(),
+            )
+
+    async def task_runner(self, task: Coroutine, ctx: DownloadContext):
         try:
             await task
         finally:
@@ -103,19 +159,45 @@ class DownloadManager:
     async def add_to_queue(
         self,
         download_id: int,
-        download_task: CoroutineType,
-        cancel_event: threading.Event | None,
-        priority: int = 0,
+        priority: int = PRIORITY_PLAYLIST,
+        playlist_id: int | None = None,
     ):
-        if not cancel_event:
-            cancel_event = threading.Event()
-        await self.queue.put((download_id, download_task, cancel_event, priority))
+        self.queue.put(
+            QueueItem(
+                download_id=download_id,
+                priority=priority,
+                playlist_id=playlist_id,
+            )
+        )
+
+    def promote(self, download_id: int, priority: int = PRIORITY_PLAY_NOW) -> bool:
+        return self.queue.promote(download_id, priority)
+
+    def queue_positions(self) -> list[dict]:
+        running = [
+            {"download_id": download_id, "position": 0, "status": "running"}
+            for download_id in self.tasks
+        ]
+        waiting = [
+            {
+                "download_id": item.download_id,
+                "position": position,
+                "status": "queued",
+                "priority": item.priority,
+                "playlist_id": item.playlist_id,
+            }
+            for position, item in enumerate(self.queue.ordered(), start=1)
+        ]
+        return running + waiting
 
     async def cancel_download(self, download_id):
         logger.info("Start Canceling %d", download_id)
-        task, cancel_event = self.tasks.get(download_id, (None, threading.Event()))
-        if not task:
+        if self.queue.remove(download_id):
+            logger.info("Removed %d From Queue", download_id)
+            return
+        task, ctx = self.tasks.get(download_id, (None, None))
+        if not task or not ctx:
             return
-        cancel_event.set()
+        ctx.cancel_event.set()
         task.cancel()
         logger.info("Start Canceling %d Done", download_id)
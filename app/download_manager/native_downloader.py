@@ -0,0 +1,239 @@
+import asyncio
+import os
+from collections import deque
+from pathlib import Path
+
+import aiohttp
+from yt_dlp.utils import sanitize_filename
+
+from app.core import config
+from app.core.logging import get_logger
+from app.download_manager.manager import DownloadContext
+from app.download_manager.storage import track_storage
+from app.http.bandwidth import bandwidth_limiter
+from app.http.session import build_connector
+from app.models.playlist import DownloadStatusEnum, TrackModel
+from app.models.settings import SettingsModel
+from app.soundcloud.client import SoundCloudClient
+from app.soundcloud.stream import (
+    EXTENSIONS,
+    get_track_stream,
+    parse_hls_playlist,
+)
+
+logger = get_logger(__name__)
+
+SEGMENT_RETRIES = 3
+CHUNK_SIZE = 64 * 1024
+
+
+class TemplateFields(dict):
+    # yt-dlp renders unknown template fields as NA
+    def __missing__(self, key):
+        return "NA"
+
+
+def output_path(fields: dict) -> Path:
+    values = TemplateFields(
+        {key: sanitize_filename(str(value)) for key, value in fields.items()}
+    )
+    return Path(track_storage.download_template() % values)
+
+
+class NativeDownloader:
+    """SoundCloud progressive/HLS streams fetched with aiohttp on the event loop
+
+    Media is served by CDNs, so it gets its own session: no SoundCloud
+    credentials and no share of the api-v2 connection limit.
+    """
+
+    def __init__(self) -> None:
+        self._session: aiohttp.ClientSession | None = None
+        self._proxy: str | None = None
+        # replaced sessions still closing, the loop only keeps weak references
+        self._closing: set[asyncio.Task] = set()
+
+    def get_session(self, proxy: str | None) -> aiohttp.ClientSession:
+        if self._session and not self._session.closed and self._proxy == proxy:
+            return self._session
+        if self._session and not self._session.closed:
+            # sessions can't change proxy, the old one closes with its requests
+            task = asyncio.create_task(self._session.close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        self._session = aiohttp.ClientSession(
+            # one CDN host serves every segment of every concurrent download
+            connector=build_connector(limit_per_host=0),
+            proxy=proxy,
+            timeout=aiohttp.ClientTimeout(sock_connect=30, sock_read=60),
+        )
+        self._proxy = proxy
+        return self._session
+
+    async def download(
+        self,
+        ctx: DownloadContext,
+        track: TrackModel,
+        sc_client: SoundCloudClient,
+        setting: SettingsModel | None,
+    ) -> str:
+        """Download `track`, returns the file path
+
+        Raises `UnsupportedStreamError` when yt-dlp has to take over.
+        """
+        proxy = setting.get_http_proxy() if setting else config.settings.http_proxy
+        segments_concurrency = (
+            setting.concurrent_fragment_downloads
+            if setting
+            else config.settings.concurrent_fragment_downloads
+        )
+        async with sc_client.session(setting) as api_session:
+            sc_auth = await sc_client.get_auth(setting)
+            info, transcoding, media_url = await get_track_stream(
+                track.platform_id, api_session, sc_auth
+            )
+        mime_type = transcoding.format.mime_type.split(";")[0]
+        file_path = output_path(
+            {
+                "title": info.title or track.name,
+                "id": info.id,
+                "ext": EXTENSIONS[mime_type],
+            }
+        )
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = file_path.with_name(file_path.name + ".part")
+
+        session = self.get_session(proxy)
+        logger.info(
+            "native download %d via %s into %s",
+            ctx.download_track_id,
+            transcoding.format.protocol,
+            file_path,
+        )
+        try:
+            with open(part_path, "wb") as file:
+                if transcoding.format.protocol == "hls":
+                    await self.fetch_hls(
+                        ctx, track, session, media_url, file, segments_concurrency
+                    )
+                else:
+                    await self.fetch_progressive(ctx, track, session, media_url, file)
+            os.replace(part_path, file_path)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+        return str(file_path)
+
+    def report(
+        self,
+        ctx: DownloadContext,
+        track: TrackModel,
+        percent: float,
+        downloaded_bytes: int,
+        total_bytes: int,
+    ) -> None:
+        if ctx.cancel_event.is_set():
+            logger.info("Native Download Is Canceled")
+            raise asyncio.CancelledError()
+        ctx.downloaded_bytes = downloaded_bytes
+        ctx.progress.update(
+            ctx.download_track_id,
+            track.id or 0,
+            int(percent),
+            DownloadStatusEnum.DOWNLOADING,
+            downloaded_bytes=downloaded_bytes,
+            total_bytes=total_bytes,
+        )
+
+    async def fetch_progressive(
+        self,
+        ctx: DownloadContext,
+        track: TrackModel,
+        session: aiohttp.ClientSession,
+        url: str,
+        file,
+    ) -> None:
+        async with session.get(url) as req:
+            req.raise_for_status()
+            total = req.content_length or 0
+            received = 0
+            async for chunk in req.content.iter_chunked(CHUNK_SIZE):
+                await bandwidth_limiter.wait(len(chunk))
+                file.write(chunk)
+                received += len(chunk)
+                if total:
+                    self.report(ctx, track, received * 100 / total, received, total)
+
+    async def fetch_segment(self, session: aiohttp.ClientSession, url: str) -> bytes:
+        for attempt in range(SEGMENT_RETRIES + 1):
+            try:
+                async with session.get(url) as req:
+                    req.raise_for_status()
+                    segment = await req.read()
+                await bandwidth_limiter.wait(len(segment))
+                return segment
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                if attempt >= SEGMENT_RETRIES:
+                    raise
+                logger.warning(
+                    "segment retry %d/%d %s", attempt + 1, SEGMENT_RETRIES, err
+                )
+                await asyncio.sleep(0.5 * 2**attempt)
+        raise AssertionError("unreachable")
+
+    async def fetch_hls(
+        self,
+        ctx: DownloadContext,
+        track: TrackModel,
+        session: aiohttp.ClientSession,
+        url: str,
+        file,
+        concurrency: int,
+    ) -> None:
+        async with session.get(url) as req:
+            req.raise_for_status()
+            segments = parse_hls_playlist(str(req.url), await req.text())
+
+        # a sliding window keeps at most `concurrency` segments in memory and
+        # writes them in playlist order
+        pending: deque[asyncio.Task] = deque()
+        urls = iter(segments)
+        try:
+            for segment_url in urls:
+                pending.append(
+                    asyncio.create_task(self.fetch_segment(session, segment_url))
+                )
+                if len(pending) >= max(concurrency, 1):
+                    break
+            written = written_bytes = 0
+            while pending:
+                segment = await pending.popleft()
+                file.write(segment)
+                written += 1
+                written_bytes += len(segment)
+                # segment sizes vary, the total is extrapolated
+                self.report(
+                    ctx,
+                    track,
+                    written * 100 / len(segments),
+                    written_bytes,
+                    written_bytes * len(segments) // written,
+                )
+                next_url = next(urls, None)
+                if next_url:
+                    pending.append(
+                        asyncio.create_task(self.fetch_segment(session, next_url))
+                    )
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._closing:
+            await asyncio.gather(*self._closing)
+
+
+native_downloader = NativeDownloader()
@@ -0,0 +1,68 @@
+from collections.abc import Iterable
+
+from sqlmodel import Session, select
+
+from app.core.logging import get_logger
+from app.models.playlist import PlaylistTrackLinkModel
+
+logger = get_logger(__name__)
+
+NO_PLAYLISTS: frozenset[int] = frozenset()
+
+
+class PlaylistIndex:
+    """Which playlists each track is in, kept in memory for routing progress
+
+    Loaded from `PlaylistTrackLinkModel` on startup, after that the playlist
+    sync endpoints report the links they add and remove. Changed from the
+    event loop only, but yt-dlp progress hooks read it from their threads,
+    so every change swaps in a new frozenset instead of mutating one.
+    """
+
+    def __init__(self) -> None:
+        self._playlists: dict[int, frozenset[int]] = {}
+
+    def load(self, orm: Session) -> None:
+        playlists: dict[int, set[int]] = {}
+        links_qs = select(
+            PlaylistTrackLinkModel.track_id, PlaylistTrackLinkModel.playlist_id
+        )
+        for track_id, playlist_id in orm.exec(links_qs):
+            playlists.setdefault(track_id, set()).add(playlist_id)
+        self._playlists = {
+            track_id: frozenset(ids) for track_id, ids in playlists.items()
+        }
+        logger.info("playlist index loaded %d tracks", len(self._playlists))
+
+    def link(self, playlist_id: int, track_ids: Iterable[int]) -> None:
+        for track_id in track_ids:
+            playlists = self._playlists.get(track_id, NO_PLAYLISTS)
+            if playlist_id not in playlists:
+                self._playlists[track_id] = playlists | {playlist_id}
+
+    def unlink(self, playlist_id: int, track_ids: Iterable[int]) -> None:
+        for track_id in track_ids:
+            playlists = self._playlists.get(track_id, NO_PLAYLISTS)
+            if playlist_id not in playlists:
+                continue
+            if len(playlists) == 1:
+                del self._playlists[track_id]
+            else:
+                self._playlists[track_id] = playlists - {playlist_id}
+
+    def playlists(self, track_id: int) -> frozenset[int]:
+        return self._playlists.get(track_id, NO_PLAYLISTS)
+
+    def playlist_for(self, track_id: int) -> int | None:
+        """Queue bucket for a download queued without a playlist request
+
+        The lowest playlist id, so the same track lands in the same bucket
+        on every restart and retry.
+        """
+        return min(self.playlists(track_id), default=None)
+
+    def __len__(self) -> int:
+        return len(self._playlists)
+
+
+playlist_index = PlaylistIndex()
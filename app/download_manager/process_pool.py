@@ -0,0 +1,278 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection, wait
+from typing import Callable
+
+from app.core.logging import get_logger
+from app.http.bandwidth import BandwidthLimiter
+from app.soundcloud.download import VOLATILE_PARAMS, YtdlTimings
+
+logger = get_logger(__name__)
+
+# keys of the yt-dlp progress dict `download_hook` reads
+PROGRESS_KEYS = (
+    "status",
+    "_percent",
+    "filename",
+    "downloaded_bytes",
+    "total_bytes",
+    "total_bytes_estimate",
+    "speed",
+)
+
+
+class DownloadCancelled(Exception):
+    """Raised inside a worker process by the progress hook"""
+
+
+class ChildLogger:
+    def debug(self, msg): ...
+
+    def info(self, msg): ...
+
+    def warning(self, msg): ...
+
+    def error(self, msg):
+        logger.error(msg)
+
+
+def worker_main(conn: Connection, limiter: BandwidthLimiter | None) -> None:
+    """Worker process loop: one download at a time, cancel messages any time
+
+    Commands arrive on `conn` in a listener thread, progress and results go
+    back on the same pipe from the main thread.
+    """
+    # imported here so only the child pays for its YoutubeDL instances
+    from app.soundcloud.download import ytdl_pool
+
+    ytdl_pool.max_idle = 1
+    # the parent's limiter, its state is shared memory
+    ytdl_pool.limiter = limiter
+    cancelled: set[int] = set()
+    jobs: list = []
+    wakeup = threading.Event()
+
+    def listen():
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = ("stop",)
+            if message[0] == "cancel":
+                cancelled.add(message[1])
+                continue
+            jobs.append(message)
+            wakeup.set()
+            if message[0] == "stop":
+                return
+
+    threading.Thread(target=listen, daemon=True).start()
+    while True:
+        wakeup.wait()
+        wakeup.clear()
+        while jobs:
+            message = jobs.pop(0)
+            if message[0] == "stop":
+                ytdl_pool.close()
+                return
+            _, download_id, url, params = message
+            last_percent = -1
+
+            def hook(dtl: dict, download_id=download_id) -> None:
+                nonlocal last_percent
+                if download_id in cancelled:
+                    raise DownloadCancelled(download_id)
+                percent = int(dtl.get("_percent", 0))
+                # only changes cross the process boundary
+                if percent == last_percent and dtl.get("status") == "downloading":
+                    return
+                last_percent = percent
+                progress = {key: dtl.get(key) for key in PROGRESS_KEYS}
+                conn.send(("progress", download_id, progress))
+
+            params["logger"] = ChildLogger()
+            ok, err, timings = ytdl_pool.download(url, params, hook)
+            cancelled.discard(download_id)
+            conn.send(
+                (
+                    "done",
+                    download_id,
+                    ok,
+                    repr(err) if err else None,
+                    dataclasses.asdict(timings),
+                )
+            )
+
+
+@dataclasses.dataclass(eq=False)
+class ProcessWorker:
+    process: multiprocessing.process.BaseProcess
+    conn: Connection
+    alive: bool = True
+
+
+@dataclasses.dataclass
+class PendingDownload:
+    worker: ProcessWorker
+    hook: Callable[[dict], None]
+    future: asyncio.Future
+
+
+class DownloadProcessPool:
+    """yt-dlp downloads in worker processes, off the API process's GIL
+
+    Each worker runs one download at a time over its own duplex pipe, so a
+    crashed worker only closes its pipe and can't corrupt the others. A
+    reader thread waits on every pipe and hands events to the event loop,
+    where the usual `download_hook` updates the progress store.
+    """
+
+    def __init__(self, processes: int, limiter: BandwidthLimiter | None = None) -> None:
+        self.processes = processes
+        self.limiter = limiter
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: asyncio.Queue[ProcessWorker] = asyncio.Queue()
+        self._pending: dict[int, PendingDownload] = {}
+        self._workers: list[ProcessWorker] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+        # wakes the reader up when the set of pipes changes
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._closed = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for _ in range(self.processes):
+            self._idle.put_nowait(self.spawn())
+        self._reader = threading.Thread(target=self.read_events, daemon=True)
+        self._reader.start()
+        logger.info("download process pool started with %d workers", self.processes)
+
+    def spawn(self) -> ProcessWorker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main, args=(child_conn, self.limiter), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = ProcessWorker(process=process, conn=parent_conn)
+        self._workers.append(worker)
+        self._wakeup_writer.send(None)
+        return worker
+
+    def read_events(self) -> None:
+        while not self._closed:
+            workers = {
+                worker.conn: worker for worker in list(self._workers) if worker.alive
+            }
+            for conn in wait([*workers, self._wakeup_reader]):
+                if conn is self._wakeup_reader:
+                    self._wakeup_reader.recv()
+                    continue
+                worker = workers[conn]  # type: ignore
+                try:
+                    event = conn.recv()  # type: ignore
+                except (EOFError, OSError):
+                    worker.alive = False
+                    event = ("died",)
+                assert self._loop
+                self._loop.call_soon_threadsafe(self.dispatch, worker, event)
+
+    def dispatch(self, worker: ProcessWorker, event: tuple) -> None:
+        if event[0] == "died":
+            self.on_worker_died(worker)
+            return
+
+        kind, download_id, *payload = event
+        pending = self._pending.get(download_id)
+        if not pending:
+            return
+        if kind == "progress":
+            try:
+                pending.hook(payload[0])
+            except asyncio.CancelledError:
+                # `download_hook` saw the cancel event, pass it to the worker
+                self.cancel(download_id)
+            return
+
+        ok, error, timings = payload
+        del self._pending[download_id]
+        self._idle.put_nowait(pending.worker)
+        if not pending.future.done():
+            pending.future.set_result(
+                (ok, Exception(error) if error else None, YtdlTimings(**timings))
+            )
+
+    def on_worker_died(self, worker: ProcessWorker) -> None:
+        if self._closed:
+            return
+        logger.error("download worker %s died", worker.process.pid)
+        # `download` may have dropped it already, as a dead idle worker
+        if worker in self._workers:
+            self._workers.remove(worker)
+        # the reader stopped waiting on the pipe when it saw it close
+        worker.conn.close()
+        for download_id, pending in list(self._pending.items()):
+            if pending.worker is not worker:
+                continue
+            # a busy worker is replaced here, an idle one when it is taken
+            del self._pending[download_id]
+            self._idle.put_nowait(self.spawn())
+            if not pending.future.done():
+                pending.future.set_result(
+                    (False, Exception("download worker died"), YtdlTimings())
+                )
+
+    def cancel(self, download_id: int) -> None:
+        pending = self._pending.get(download_id)
+        if not pending:
+            return
+        try:
+            pending.worker.conn.send(("cancel", download_id))
+        except (BrokenPipeError, OSError):
+            logger.warning("can't cancel %d, its worker is gone", download_id)
+
+    async def download(
+        self,
+        download_id: int,
+        url: str,
+        params: dict,
+        hook: Callable[[dict], None],
+    ) -> tuple[bool, Exception | None, YtdlTimings]:
+        worker = await self._idle.get()
+        if not worker.alive or not worker.process.is_alive():
+            logger.warning("idle download worker %s died", worker.process.pid)
+            # its pipe is closed once the reader reports it died
+            if worker in self._workers:
+                self._workers.remove(worker)
+            worker = self.spawn()
+        assert self._loop
+        future = self._loop.create_future()
+        self._pending[download_id] = PendingDownload(worker, hook, future)
+        params = {
+            key: value for key, value in params.items() if key not in VOLATILE_PARAMS
+        }
+        worker.conn.send(("download", download_id, url, params))
+        try:
+            # shielded, the worker is only handed back once it reports `done`
+            # even when the caller was cancelled
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.cancel(download_id)
+            raise
+
+    def close(self) -> None:
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+        self._wakeup_writer.send(None)
+        self._workers.clear()
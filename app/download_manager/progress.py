@@ -0,0 +1,462 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from pydantic import BaseModel, ConfigDict
+
+from app.core import config
+from app.download_manager.playlist_index import playlist_index
+from app.models.playlist import DownloadStatusEnum
+
+# changed downloads a subscriber may fall behind on before it gets a resync
+SUBSCRIBER_BUFFER = 1024
+FINISHED_STATUSES = (DownloadStatusEnum.SUCCESSFUL, DownloadStatusEnum.FAILED)
+THROUGHPUT_WINDOW = 1.0  # seconds of transferred bytes per throughput sample
+THROUGHPUT_TAU = 5.0  # seconds, older samples fade out with this time constant
+# a speed derived from less than this is noise, it's left unknown
+SPEED_MIN_ELAPSED = 1.0  # seconds
+SPEED_MIN_BYTES = 64 * 1024
+
+
+class DownloadProgressReport(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    track_id: int = -1
+    percent: int = 0
+    status: DownloadStatusEnum = DownloadStatusEnum.DOWNLOADING
+    downloaded_bytes: int = 0
+    total_bytes: int = 0  # 0 until the size is known
+    speed: float | None = None  # bytes/s
+
+
+class ProgressSlot:
+    """Latest progress of one download, updated in place"""
+
+    __slots__ = (
+        "track_id",
+        "percent",
+        "status",
+        "seq",
+        "downloaded_bytes",
+        "total_bytes",
+        "speed",
+        "started_at",
+        "totals",
+    )
+
+    def __init__(
+        self, track_id: int, now: float, totals: list["ProgressTotals"]
+    ) -> None:
+        self.track_id = track_id
+        self.percent = 0
+        self.status = DownloadStatusEnum.DOWNLOADING
+        self.seq = 0  # sequence number of its last published change
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.speed: float | None = None
+        self.started_at = now
+        # overall and its playlists', fixed so it's taken out of the same ones
+        self.totals = totals
+
+    def report(self) -> DownloadProgressReport:
+        return DownloadProgressReport(
+            track_id=self.track_id,
+            percent=self.percent,
+            status=self.status,
+            downloaded_bytes=self.downloaded_bytes,
+            total_bytes=self.total_bytes,
+            speed=self.speed,
+        )
+
+
+@dataclass
+class ProgressSummary:
+    downloads: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0  # of the downloads whose size is known
+    bytes_remaining: int = 0  # of the running downloads whose size is known
+    throughput: float = 0.0  # bytes/s, rolling
+    eta: float | None = None  # seconds until the running downloads are done
+
+
+class ProgressTotals:
+    """Running sums over the downloads of a playlist, or of all of them
+
+    Finished downloads stay counted after they're evicted from the store.
+    """
+
+    __slots__ = (
+        "downloads",
+        "running",
+        "completed",
+        "failed",
+        "bytes_done",
+        "bytes_total",
+        "bytes_remaining",
+        "throughput",
+        "_window_bytes",
+        "_window_started",
+    )
+
+    def __init__(self, now: float) -> None:
+        self.downloads = self.running = self.completed = self.failed = 0
+        self.bytes_done = self.bytes_total = self.bytes_remaining = 0
+        self.throughput = 0.0
+        self._window_bytes = 0
+        self._window_started = now
+
+    def count(self, slot: ProgressSlot, sign: int) -> None:
+        """Add the slot's share, or take it out with `sign` -1"""
+        running = slot.status == DownloadStatusEnum.DOWNLOADING
+        self.downloads += sign
+        self.running += sign * running
+        self.completed += sign * (slot.status == DownloadStatusEnum.SUCCESSFUL)
+        self.failed += sign * (slot.status == DownloadStatusEnum.FAILED)
+        self.bytes_done += sign * slot.downloaded_bytes
+        self.bytes_total += sign * slot.total_bytes
+        if running and slot.total_bytes:
+            remaining = max(slot.total_bytes - slot.downloaded_bytes, 0)
+            self.bytes_remaining += sign * remaining
+
+    def progressed(self, size: int, remaining: int, now: float) -> None:
+        """`size` more bytes done, `remaining` changed by that much"""
+        self.bytes_done += size
+        self.bytes_remaining += remaining
+        if size > 0:
+            self._window_bytes += size
+            if now - self._window_started >= THROUGHPUT_WINDOW:
+                self.roll(now)
+
+    def roll(self, now: float) -> None:
+        elapsed = now - self._window_started
+        if elapsed < THROUGHPUT_WINDOW:
+            return
+        # weighted by time, an idle gap decays the rate towards 0
+        weight = math.exp(-elapsed / THROUGHPUT_TAU)
+        self.throughput = (
+            weight * self.throughput + (1 - weight) * self._window_bytes / elapsed
+        )
+        self._window_bytes = 0
+        self._window_started = now
+
+    def summary(self, now: float) -> ProgressSummary:
+        self.roll(now)
+        eta = None
+        if self.running and self.throughput > 0:
+            eta = self.bytes_remaining / self.throughput
+        return ProgressSummary(
+            downloads=self.downloads,
+            running=self.running,
+            completed=self.completed,
+            failed=self.failed,
+            bytes_done=self.bytes_done,
+            bytes_total=self.bytes_total,
+            bytes_remaining=self.bytes_remaining,
+            throughput=self.throughput,
+            eta=eta,
+        )
+
+
+@dataclass
+class ProgressStats:
+    updates: int = 0  # calls from progress hooks and status changes
+    published: int = 0  # updates that changed a percent or status
+    wakeups: int = 0  # times the loop was woken to fan changes out
+    subscribers: int = 0
+    resyncs: int = 0  # subscribers that overflowed their buffer
+    size: int = 0  # downloads held, running and recently finished
+    finished: int = 0
+    evicted: int = 0  # finished downloads dropped by age or count
+
+
+class ProgressSubscriber:
+    """One stream consumer, the downloads changed since its last message"""
+
+    def __init__(self, last_seq: int, playlist_id: int | None) -> None:
+        self.last_seq = last_seq
+        # only downloads of this playlist's tracks, None is all of them
+        self.playlist_id = playlist_id
+        self.pending: dict[int, None] = {}
+        # the next message is computed from sequence numbers, not `pending`
+        self.resync = True
+        # the last message may miss evicted downloads, look them up in the DB
+        self.behind = False
+        self.event = asyncio.Event()
+        self.event.set()
+
+    def wants(self, slot: ProgressSlot) -> bool:
+        return self.playlist_id is None or self.playlist_id in (
+            playlist_index.playlists(slot.track_id)
+        )
+
+
+class ProgressStore:
+    """Latest progress per download, safe to update from yt-dlp threads
+
+    An update is only published when it changes the percent or the status.
+    Every published change gets the next sequence number, and the changed
+    downloads are handed to each subscriber's bounded buffer on the event
+    loop, with at most one wakeup pending however many threads publish.
+    Playlist subscribers are found through `playlist_index`, a change only
+    reaches the streams of the playlists its track is in.
+
+    Finished and failed downloads are only kept for
+    `progress_finished_ttl` seconds, and at most `progress_finished_max` of
+    them, their history is in the DB. They stay counted in the totals
+    until the same download is updated again, by a retry or a re-add.
+
+    Every update also keeps `ProgressTotals` per playlist and overall, so
+    counts, bytes, throughput and ETA are read without a scan.
+    """
+
+    def __init__(self) -> None:
+        self.stats = ProgressStats()
+        self._slots: dict[int, ProgressSlot] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wakeup_pending = False
+        self._changed: dict[int, None] = {}
+        # by playlist id, None for the streams of every download
+        self._subscribers: dict[int | None, set[ProgressSubscriber]] = {}
+        # finished download ids by the time they finished, oldest first
+        self._finished: OrderedDict[int, float] = OrderedDict()
+        self.finished_ttl = config.settings.progress_finished_ttl
+        self.finished_max = config.settings.progress_finished_max
+        # starts from the clock, so event ids from before a restart are older
+        # than every change made after it
+        self._seq = time.time_ns() // 1000
+        # newest sequence number among the evicted downloads
+        self._evicted_seq = 0
+        # by playlist id, None for all downloads
+        self._totals: dict[int | None, ProgressTotals] = {}
+        # evicted downloads still counted in their totals, a download that
+        # comes back is taken out of them before its new slot is counted
+        self._evicted: dict[int, ProgressSlot] = {}
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def update(
+        self,
+        download_id: int,
+        track_id: int,
+        percent: int = 0,
+        status: DownloadStatusEnum | None = None,
+        downloaded_bytes: int | None = None,
+        total_bytes: int | None = None,
+        speed: float | None = None,
+    ) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self.stats.updates += 1
+            slot = self._slots.get(download_id)
+            changed = slot is None
+            if slot is None:
+                evicted = self._evicted.pop(download_id, None)
+                if evicted is not None:
+                    self._count(evicted, -1)
+                slot = self._slots[download_id] = ProgressSlot(
+                    track_id, now, self._slot_totals(track_id, now)
+                )
+                self._count(slot, 1)
+            if (status is not None and status != slot.status) or (
+                total_bytes and total_bytes != slot.total_bytes
+            ):
+                self._count(slot, -1)
+                if status is not None and status != slot.status:
+                    if status in FINISHED_STATUSES:
+                        self._finished[download_id] = now
+                        self._finished.move_to_end(download_id)
+                    elif slot.status in FINISHED_STATUSES:
+                        # retried, starts over
+                        self._finished.pop(download_id, None)
+                        slot.percent = slot.downloaded_bytes = slot.total_bytes = 0
+                        slot.speed = None
+                        slot.started_at = now
+                    slot.status = status
+                    changed = True
+                if total_bytes:
+                    slot.total_bytes = int(total_bytes)
+                self._count(slot, 1)
+            if percent > slot.percent:
+                slot.percent = percent
+                changed = True
+            if downloaded_bytes is not None:
+                if downloaded_bytes != slot.downloaded_bytes:
+                    self._progressed(slot, downloaded_bytes, now)
+                elapsed = now - slot.started_at
+                if (
+                    speed is None
+                    and elapsed >= SPEED_MIN_ELAPSED
+                    and downloaded_bytes >= SPEED_MIN_BYTES
+                ):
+                    speed = downloaded_bytes / elapsed
+            if speed is not None:
+                slot.speed = speed
+            if not changed:
+                return False
+            self.stats.published += 1
+            self._seq += 1
+            slot.seq = self._seq
+            self._changed[download_id] = None
+            self._evict(now)
+            if self._wakeup_pending:
+                return True
+            self._wakeup_pending = True
+            self.stats.wakeups += 1
+
+        if threading.get_ident() == self._loop_thread:
+            self._wake_up()
+        else:
+            self._loop.call_soon_threadsafe(self._wake_up)
+        return True
+
+    def _wake_up(self) -> None:
+        with self._lock:
+            self._wakeup_pending = False
+            changed, self._changed = self._changed, {}
+            slots = [
+                (download_id, self._slots[download_id])
+                for download_id in changed
+                if download_id in self._slots
+            ]
+        for download_id, slot in slots:
+            for subscriber in self._recipients(slot):
+                if len(subscriber.pending) >= SUBSCRIBER_BUFFER:
+                    subscriber.pending.clear()
+                    subscriber.resync = True
+                    self.stats.resyncs += 1
+                if not subscriber.resync:
+                    subscriber.pending[download_id] = None
+                subscriber.event.set()
+
+    def _slot_totals(self, track_id: int, now: float) -> list[ProgressTotals]:
+        totals = []
+        for key in (None, *playlist_index.playlists(track_id)):
+            if key not in self._totals:
+                self._totals[key] = ProgressTotals(now)
+            totals.append(self._totals[key])
+        return totals
+
+    @staticmethod
+    def _count(slot: ProgressSlot, sign: int) -> None:
+        for totals in slot.totals:
+            totals.count(slot, sign)
+
+    @staticmethod
+    def _progressed(slot: ProgressSlot, downloaded_bytes: int, now: float) -> None:
+        size = downloaded_bytes - slot.downloaded_bytes
+        remaining = 0
+        if slot.status == DownloadStatusEnum.DOWNLOADING and slot.total_bytes:
+            remaining = max(slot.total_bytes - downloaded_bytes, 0) - max(
+                slot.total_bytes - slot.downloaded_bytes, 0
+            )
+        slot.downloaded_bytes = downloaded_bytes
+        for totals in slot.totals:
+            totals.progressed(size, remaining, now)
+
+    def _recipients(self, slot: ProgressSlot) -> Iterator[ProgressSubscriber]:
+        yield from self._subscribers.get(None, ())
+        for playlist_id in playlist_index.playlists(slot.track_id):
+            yield from self._subscribers.get(playlist_id, ())
+
+    def subscribe(
+        self,
+        last_event_id: int | None = None,
+        playlist_id: int | None = None,
+    ) -> ProgressSubscriber:
+        """The first message is a full snapshot, or the changes after
+        `last_event_id` when a client resumes"""
+        self.evict()
+        last_seq = -1
+        if last_event_id is not None and last_event_id <= self._seq:
+            last_seq = last_event_id
+        subscriber = ProgressSubscriber(last_seq, playlist_id)
+        self._subscribers.setdefault(playlist_id, set()).add(subscriber)
+        self.stats.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: ProgressSubscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.playlist_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.remove(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.playlist_id]
+        self.stats.subscribers -= 1
+
+    def next_message(
+        self, subscriber: ProgressSubscriber
+    ) -> tuple[int, dict[int, DownloadProgressReport]]:
+        """Sequence number and reports for the subscriber's next message"""
+        with self._lock:
+            subscriber.behind = (
+                subscriber.resync and subscriber.last_seq < self._evicted_seq
+            )
+            if subscriber.resync:
+                slots = [
+                    (download_id, slot)
+                    for download_id, slot in self._slots.items()
+                    if slot.seq > subscriber.last_seq and subscriber.wants(slot)
+                ]
+            else:
+                slots = [
+                    (download_id, self._slots[download_id])
+                    for download_id in subscriber.pending
+                    if download_id in self._slots
+                ]
+            reports = {download_id: slot.report() for download_id, slot in slots}
+            seq = self._seq
+        subscriber.pending.clear()
+        subscriber.resync = False
+        subscriber.event.clear()
+        subscriber.last_seq = seq
+        return seq, reports
+
+    def _evict(self, now: float) -> None:
+        while self._finished:
+            download_id, finished_at = next(iter(self._finished.items()))
+            if (
+                len(self._finished) <= self.finished_max
+                and now - finished_at < self.finished_ttl
+            ):
+                break
+            del self._finished[download_id]
+            slot = self._evicted[download_id] = self._slots.pop(download_id)
+            self._evicted_seq = max(self._evicted_seq, slot.seq)
+            self.stats.evicted += 1
+        self.stats.size = len(self._slots)
+        self.stats.finished = len(self._finished)
+
+    def evict(self) -> None:
+        """Drop expired finished downloads, updates also do this"""
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def get(self, download_id: int) -> ProgressSlot | None:
+        return self._slots.get(download_id)
+
+    def snapshot(self) -> dict[int, DownloadProgressReport]:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                download_id: slot.report() for download_id, slot in self._slots.items()
+            }
+
+    def summary(self, playlist_id: int | None = None) -> ProgressSummary:
+        """Totals of one playlist's downloads, or of all downloads"""
+        now = time.monotonic()
+        with self._lock:
+            totals = self._totals.get(playlist_id)
+            return totals.summary(now) if totals else ProgressSummary()
+
+    def __len__(self) -> int:
+        return len(self._slots)
@@ -0,0 +1,96 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, func, select
+
+from app.core import config
+from app.core.db import engine
+from app.core.logging import get_logger
+from app.download_manager.manager import DownloadManager
+from app.download_manager.playlist_index import playlist_index
+from app.download_manager.scheduler import PRIORITY_PLAYLIST
+from app.models.playlist import DownloadStatusEnum, DownloadTrackModel
+
+logger = get_logger(__name__)
+
+
+def retry_delay(attempts: int) -> float:
+    # jittered so a batch failing together doesn't retry together
+    delay = config.settings.download_retry_backoff_base * 2 ** (attempts - 1)
+    delay = min(delay, config.settings.download_retry_backoff_max)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def schedule_retry(download: DownloadTrackModel, retries: int) -> bool:
+    """Set `next_attempt_at` when `download` has attempts left"""
+    if download.attempts >= retries:
+        download.next_attempt_at = None
+        return False
+    download.next_attempt_at = datetime.now() + timedelta(
+        seconds=retry_delay(download.attempts)
+    )
+    return True
+
+
+class RetryScheduler:
+    """Re-queues failed downloads once their `next_attempt_at` is due
+
+    Retry state lives on `DownloadTrackModel`, so waiting retries survive a
+    restart and don't hold a download slot.
+    """
+
+    def __init__(self) -> None:
+        self._wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        """A retry was scheduled, recompute the next due time"""
+        self._wakeup.set()
+
+    def requeue_due(self, orm: Session) -> list[tuple[int, int]]:
+        """(download id, track id) of the due downloads, set back to pending"""
+        due_qs = select(DownloadTrackModel).where(
+            DownloadTrackModel.status == DownloadStatusEnum.FAILED,
+            DownloadTrackModel.next_attempt_at <= datetime.now(),  # type: ignore
+        )
+        downloads = orm.exec(due_qs).fetchall()
+        for download in downloads:
+            download.status = DownloadStatusEnum.PENDING
+            download.next_attempt_at = None
+            orm.add(download)
+        orm.commit()
+        return [
+            (download.id, download.track_id) for download in downloads if download.id
+        ]
+
+    def next_due(self, orm: Session) -> datetime | None:
+        next_due_qs = select(func.min(DownloadTrackModel.next_attempt_at)).where(
+            DownloadTrackModel.status == DownloadStatusEnum.FAILED
+        )
+        return orm.exec(next_due_qs).one_or_none()
+
+    async def run(self, download_manager: DownloadManager) -> None:
+        while True:
+            self._wakeup.clear()
+            with Session(engine) as orm:
+                due = self.requeue_due(orm)
+                next_due = self.next_due(orm)
+            for download_id, track_id in due:
+                await download_manager.add_to_queue(
+                    download_id,
+                    PRIORITY_PLAYLIST,
+                    playlist_index.playlist_for(track_id),
+                )
+            if due:
+                logger.info("re-queued %d failed downloads", len(due))
+
+            timeout = None
+            if next_due:
+                timeout = max((next_due - datetime.now()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+retry_scheduler = RetryScheduler()
@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# lower value is served first, like `asyncio.PriorityQueue`
+PRIORITY_PLAY_NOW = -100
+PRIORITY_TRACK = -1
+PRIORITY_PLAYLIST = 0
+
+
+@dataclass(eq=False, slots=True)
+class QueueItem:
+    """A waiting download, the coroutine is only built once it is admitted"""
+
+    download_id: int
+    priority: int = PRIORITY_PLAYLIST
+    playlist_id: int | None = None
+    sequence: int = 0
+
+
+class DownloadScheduler:
+    """Priority queue that is fair across playlists
+
+    Items of the lowest priority value go first. Within one priority every
+    playlist gets its turn (round-robin), so a large playlist doesn't
+    starve one queued after it. Items can be promoted or removed while
+    they wait.
+    """
+
+    def __init__(self) -> None:
+        # priority -> playlist_id -> FIFO of items
+        self._levels: dict[int, OrderedDict[int | None, deque[QueueItem]]] = {}
+        self._items: dict[int, QueueItem] = {}
+        self._sequence = itertools.count()
+        self._not_empty = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, download_id: int) -> bool:
+        return download_id in self._items
+
+    def put(self, item: QueueItem, front: bool = False) -> None:
+        if item.download_id in self._items:
+            self.remove(item.download_id)
+        item.sequence = next(self._sequence)
+        playlists = self._levels.setdefault(item.priority, OrderedDict())
+        bucket = playlists.setdefault(item.playlist_id, deque())
+        if front:
+            bucket.appendleft(item)
+            playlists.move_to_end(item.playlist_id, last=False)
+        else:
+            bucket.append(item)
+        self._items[item.download_id] = item
+        self._not_empty.set()
+
+    def pop(self) -> QueueItem | None:
+        if not self._levels:
+            return None
+        priority = min(self._levels)
+        playlists = self._levels[priority]
+        playlist_id, bucket = next(iter(playlists.items()))
+        item = bucket.popleft()
+        # rotate, the next pop serves the following playlist
+        if bucket:
+            playlists.move_to_end(playlist_id)
+        else:
+            del playlists[playlist_id]
+        if not playlists:
+            del self._levels[priority]
+        del self._items[item.download_id]
+        if not self._items:
+            self._not_empty.clear()
+        return item
+
+    async def get(self) -> QueueItem:
+        while True:
+            item = self.pop()
+            if item:
+                return item
+            await self._not_empty.wait()
+
+    def remove(self, download_id: int) -> QueueItem | None:
+        item = self._items.pop(download_id, None)
+        if not item:
+            return None
+        playlists = self._levels[item.priority]
+        bucket = playlists[item.playlist_id]
+        bucket.remove(item)
+        if not bucket:
+            del playlists[item.playlist_id]
+        if not playlists:
+            del self._levels[item.priority]
+        if not self._items:
+            self._not_empty.clear()
+        return item
+
+    def promote(self, download_id: int, priority: int = PRIORITY_PLAY_NOW) -> bool:
+        """Move a waiting item to the head of `priority`"""
+        item = self.remove(download_id)
+        if not item:
+            return False
+        item.priority = min(item.priority, priority)
+        self.put(item, front=True)
+        logger.info("download %d promoted to priority %d", download_id, priority)
+        return True
+
+    def ordered(self) -> list[QueueItem]:
+        """Waiting items in the order `pop` would hand them out"""
+        ordered = []
+        for priority in sorted(self._levels):
+            buckets = [deque(bucket) for bucket in self._levels[priority].values()]
+            while buckets:
+                bucket = buckets.pop(0)
+                ordered.append(bucket.popleft())
+                if bucket:
+                    buckets.append(bucket)
+        return ordered
@@ -1,17 +1,20 @@
 import asyncio
+import aiohttp
 from fastapi.routing import APIRouter
 from sqlmodel import select
 from app.core import config
 from app.core.db import SessionDep, get_session
 from app.core.logging import get_logger
-from app.download_manager.manager import (
-    DownloadContext,
-    DownloadProgressReport,
-    update_progress_reports,
-)
-from app.models.playlist import DownloadStatusEnum, DownloadTrackModel
+from app.download_manager.manager import DownloadContext
+from app.download_manager.native_downloader import native_downloader
+from app.download_manager.process_pool import DownloadProcessPool
+from app.download_manager.retry import retry_scheduler, schedule_retry
+from app.download_manager.storage import track_storage
+from app.models.playlist import DownloadStatusEnum, DownloadTrackModel, TrackModel
 from app.models.settings import SettingsModel
-from app.soundcloud.download import sync_download_ytdl
+from app.soundcloud.client import SoundCloudClient
+from app.soundcloud.download import ytdl_pool
+from app.soundcloud.stream import UnsupportedStreamError
 import functools
 
 router = APIRouter(prefix="/downloads")
@@ -22,6 +25,7 @@ YTDL_STATUS_MAP = {
     "failed": DownloadStatusEnum.FAILED,
     "finished": DownloadStatusEnum.SUCCESSFUL,
 }
+MAX_ERROR_LENGTH = 1000
 
 
 
@@ -39,28 +43,44 @@ def error_logger(fn):
 
 @error_logger
 def download_hook(dtl, download_id: int, track_id: int, ctx: DownloadContext):
-    progress_reports: dict[int, DownloadProgressReport] = ctx.progress_reports
-
     if ctx.cancel_event.is_set():
         logger.info("Downloading Thread Is Canceled")
         raise asyncio.CancelledError()
 
     percent = int(dtl.get("_percent", 0))
+    ctx.downloaded_bytes = dtl.get("downloaded_bytes") or ctx.downloaded_bytes
     status = YTDL_STATUS_MAP.get(dtl.get("status"), DownloadStatusEnum.DOWNLOADING)
-    update_progress_reports(
-        progress_reports=progress_reports,
-        download_id=download_id,
-        track_id=track_id,
-        percent=percent,
-        status=status,
+    # most calls repeat the last percent, the store only counts their bytes
+    ctx.progress.update(
+        download_id,
+        track_id,
+        percent,
+        status,
+        downloaded_bytes=dtl.get("downloaded_bytes"),
+        total_bytes=dtl.get("total_bytes") or dtl.get("total_bytes_estimate"),
+        speed=dtl.get("speed"),
     )
 
     if dtl.get("status") == "finished":
         ctx.file_path = dtl.get("filename")
         logger.info("File Path: %s", ctx.file_path)
 
-    ctx.progress_event.set()
-    # logger.info(f"*** Progress: {current_report.percent} {current_report.status}")
+
+async def download_native(
+    ctx: DownloadContext,
+    track: TrackModel,
+    sc_client: SoundCloudClient,
+    setting: SettingsModel | None,
+) -> tuple[bool, Exception | None]:
+    try:
+        ctx.file_path = await native_downloader.download(ctx, track, sc_client, setting)
+    except UnsupportedStreamError as err:
+        logger.info("Native Download Unsupported %s, Falling Back To yt-dlp", err)
+        return False, err
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as err:
+        logger.error("Native Download Failed %s", err)
+        return False, err
+    return True, None
 
 
 class YtdlLogger:
@@ -76,7 +96,12 @@ class YtdlLogger:
         logger.error(msg)
 
 
-async def download(ctx: DownloadContext, orm: SessionDep | None = None):
+async def download(
+    ctx: DownloadContext,
+    orm: SessionDep | None = None,
+    sc_client: SoundCloudClient | None = None,
+    process_pool: DownloadProcessPool | None = None,
+):
     if not orm:
         orm = next(get_session())
 
@@ -91,6 +116,7 @@ async def download(ctx: DownloadContext, orm: SessionDep | None = None):
         return
 
     download_object.status = DownloadStatusEnum.DOWNLOADING
+    download_object.attempts += 1
     orm.add(download_object)
     orm.commit()
 
@@ -105,61 +131,91 @@ async def download(ctx: DownloadContext, orm: SessionDep | None = None):
     download_retries = (
         setting.download_retries if setting else config.settings.download_retries
     )
-    total_retry = 0
+    download_backend = (
+        setting.download_backend if setting else config.settings.download_backend
+    )
+    # native needs the app's SoundCloud session, once it fails the retries
+    # go through yt-dlp
+    use_native = (
+        download_backend == "native"
+        and sc_client is not None
+        and download_object.attempts == 1
+    )
 
     try:
         ydl_config = config.ydl_opts.copy()
-        ydl_config["progress_hooks"] = [
-            lambda dtl: download_hook(
+        ydl_config["logger"] = YtdlLogger()  # type: ignore
+        ydl_config["concurrent_fragment_downloads"] = concurrent_fragment_downloads
+        ydl_config["proxy"] = http_proxy or None
+        ydl_config["outtmpl"] = track_storage.download_template()
+
+        def progress_hook(dtl):
+            download_hook(
                 dtl=dtl,
                 download_id=download_object.id or 0,
                 track_id=download_object.track_id,
                 ctx=ctx,
             )
-        ]
-        ydl_config["logger"] = YtdlLogger()  # type: ignore
-        ydl_config["concurrent_fragment_downloads"] = concurrent_fragment_downloads
-        ydl_config["proxy"] = http_proxy or None
 
-        is_successful = True
+        is_successful = False
         exception = None
-        while total_retry < download_retries:
-            is_successful, exception = await asyncio.create_task(
-                asyncio.to_thread(
-                    sync_download_ytdl,
-                    [download_object.track.url or ""],
+        if use_native:
+            is_successful, exception = await download_native(
+                ctx, download_object.track, sc_client, setting  # type: ignore
+            )
+            if isinstance(exception, UnsupportedStreamError):
+                # not a failed attempt, yt-dlp takes it from here
+                use_native = False
+
+        if not use_native:
+            if process_pool:
+                is_successful, exception, timings = await process_pool.download(
+                    ctx.download_track_id,
+                    download_object.track.url or "",
                     ydl_config,
+                    progress_hook,
+                )
+            else:
+                is_successful, exception, timings = await asyncio.to_thread(
+                    ytdl_pool.download,
+                    download_object.track.url or "",
+                    ydl_config,
+                    progress_hook,
                 )
-            )
-            if is_successful:
-                break
             logger.info(
-                "Downloading Failed Retry %d/%d", total_retry + 1, download_retries
+                "Download %d extract %.2fs%s transfer %.2fs",
+                download_object.id,
+                timings.extract,
+                " (cached info)" if timings.cached_info else "",
+                timings.transfer,
             )
-            total_retry += 1
 
         if not is_successful:
-            update_progress_reports(
-                progress_reports=ctx.progress_reports,
-                download_id=ctx.download_track_id,
-                track_id=download_object.track_id,
+            ctx.progress.update(
+                ctx.download_track_id,
+                download_object.track_id,
                 status=DownloadStatusEnum.FAILED,
             )
             if exception:
                 raise Exception(
-                    "Download Failed Inside sync_download_ytdl"
+                    "Download Failed Inside ytdl_pool"
                 ) from exception
             else:
-                raise Exception("Download Failed Inside sync_download_ytdl")
+                raise Exception("Download Failed Inside ytdl_pool")
 
-        update_progress_reports(
-            progress_reports=ctx.progress_reports,
-            download_id=ctx.download_track_id,
-            track_id=download_object.track_id,
+        ctx.progress.update(
+            ctx.download_track_id,
+            download_object.track_id,
             status=DownloadStatusEnum.SUCCESSFUL,
         )
+        if track_storage.sharded and ctx.file_path:
+            ctx.file_path = await asyncio.to_thread(
+                track_storage.store, ctx.file_path, download_object.track.platform_id
+            )
         download_object.status = DownloadStatusEnum.SUCCESSFUL
         download_object.file_path = ctx.file_path
+        download_object.next_attempt_at = None
+        download_object.last_error = None
         orm.add(download_object)
 
         logger.info(
@@ -171,41 +227,38 @@ async def download(ctx: DownloadContext, orm: SessionDep | None = None):
     except asyncio.CancelledError:
         logger.info("Download %d Canceled", download_object.id)
         download_object.status = DownloadStatusEnum.FAILED
+        download_object.next_attempt_at = None
         orm.add(download_object)
-
-        current_report = ctx.progress_reports.get(
-            download_object.id,
-            DownloadProgressReport(track_id=download_object.track_id),
-        )
-        current_report.status = DownloadStatusEnum.FAILED
-        ctx.progress_reports[download_object.id] = current_report
-        update_progress_reports(
-            progress_reports=ctx.progress_reports,
-            download_id=ctx.download_track_id,
-            track_id=download_object.track_id,
+        ctx.progress.update(
+            ctx.download_track_id,
+            download_object.track_id,
             status=DownloadStatusEnum.FAILED,
         )
 
     except Exception as err:
         logger.error("exception when downloading `%s`", err, exc_info=True)
         download_object.status = DownloadStatusEnum.FAILED
+        download_object.last_error = str(err.__cause__ or err)[:MAX_ERROR_LENGTH]
+        # the slot is released now, `retry_scheduler` re-queues it once due
+        if schedule_retry(download_object, download_retries):
+            logger.info(
+                "Download %d Failed Attempt %d/%d Retry At %s",
+                download_object.id,
+                download_object.attempts,
+                download_retries,
+                download_object.next_attempt_at,
+            )
         orm.add(download_object)
-
-        current_report = ctx.progress_reports.get(
-            download_object.id,
-            DownloadProgressReport(track_id=download_object.track_id),
-        )
-        current_report.status = DownloadStatusEnum.FAILED
-        ctx.progress_reports[download_object.id] = current_report
-        update_progress_reports(
-            progress_reports=ctx.progress_reports,
-            download_id=ctx.download_track_id,
-            track_id=download_object.track_id,
+        ctx.progress.update(
+            ctx.download_track_id,
+            download_object.track_id,
             status=DownloadStatusEnum.FAILED,
         )
 
     try:
         orm.commit()
-        ctx.progress_event.set()
     except Exception as ex:
-        logger.error("Error on Committing %s", ex)
\ No newline at end of file
+        logger.error("Error on Committing %s", ex)
+        return
+    if download_object.next_attempt_at:
+        retry_scheduler.wake()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core import config
+from app.core.db import engine
+from app.core.logging import get_logger
+from app.models.playlist import DownloadStatusEnum, DownloadTrackModel, TrackModel
+
+logger = get_logger(__name__)
+
+STAGING_DIR = ".incoming"
+TRACKS_DIR = "tracks"
+OBJECTS_DIR = "objects"
+MIGRATION_BATCH_SIZE = 500
+
+
+@dataclass
+class StorageStats:
+    stored: int = 0
+    deduplicated: int = 0
+    bytes_saved: int = 0
+    link_failures: int = 0
+
+
+@dataclass
+class MigrationResult:
+    migrated: int = 0
+    already_migrated: int = 0
+    missing: int = 0
+    deduplicated: int = 0
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def shard(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()[:2]
+
+
+class TrackStorage:
+    """Sharded, content-addressed files under `download_folder`
+
+    Every distinct file is kept once as `objects/ab/<sha256>.<ext>` and a
+    track's file `tracks/cd/<platform_id>.<ext>` hardlinks to it, so
+    re-uploads of the same audio share one copy and titles never collide.
+    Both trees are sharded by 256 subdirectories. Downloads land in
+    `.incoming/` first and are moved in once complete.
+    """
+
+    def __init__(self) -> None:
+        self.stats = StorageStats()
+
+    @property
+    def sharded(self) -> bool:
+        return config.settings.storage_layout == "sharded"
+
+    @property
+    def root(self) -> Path:
+        return Path(config.settings.download_folder)
+
+    def download_template(self) -> str:
+        """Output template for yt-dlp and the native downloader"""
+        if not self.sharded:
+            return config.settings.output_download
+        return str(self.root / STAGING_DIR / "%(id)s.%(ext)s")
+
+    def track_path(self, platform_id: str, suffix: str) -> Path:
+        return self.root / TRACKS_DIR / shard(platform_id) / f"{platform_id}{suffix}"
+
+    def object_path(self, digest: str, suffix: str) -> Path:
+        return self.root / OBJECTS_DIR / digest[:2] / f"{digest}{suffix}"
+
+    def is_stored(self, file_path: str) -> bool:
+        path = Path(file_path)
+        return path.is_relative_to(self.root / TRACKS_DIR) or path.is_relative_to(
+            self.root / OBJECTS_DIR
+        )
+
+    def add_object(self, source: Path) -> Path:
+        """Move `source` into the object store, dropping it if the content
+        is already there"""
+        digest = file_digest(source)
+        target = self.object_path(digest, source.suffix)
+        if target.exists():
+            self.stats.deduplicated += 1
+            self.stats.bytes_saved += source.stat().st_size
+            source.unlink()
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(source, target)
+        except OSError:
+            # staging on another filesystem
+            shutil.move(source, target)
+        return target
+
+    def link_track(self, target: Path, platform_id: str) -> Path:
+        path = self.track_path(platform_id, target.suffix)
+        if path.exists():
+            if path.samefile(target):
+                return path
+            # a re-download replaces the track's previous content
+            path.unlink()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(target, path)
+        except OSError as err:
+            # no hardlinks on this filesystem, the object is the track file
+            logger.warning("can't hardlink %s, %s", path, err)
+            self.stats.link_failures += 1
+            return target
+        return path
+
+    def store(self, file_path: str, platform_id: str) -> str:
+        """Move a finished download into the store, returns its new path"""
+        target = self.add_object(Path(file_path))
+        self.stats.stored += 1
+        return str(self.link_track(target, platform_id))
+
+    def migrate_library(self) -> MigrationResult:
+        """Move existing downloads into the store and update their
+        `file_path` in bulk
+
+        Safe to run again after an interruption, a download whose file was
+        already moved is picked up from its track path.
+        """
+        result = MigrationResult()
+        deduplicated = self.stats.deduplicated
+        # two flat downloads of the same title shared one file
+        moved: dict[str, Path] = {}
+        with Session(engine) as orm:
+            downloads_qs = (
+                select(
+                    DownloadTrackModel.id,
+                    DownloadTrackModel.file_path,
+                    TrackModel.platform_id,
+                )
+                .join(TrackModel)
+                .where(
+                    DownloadTrackModel.status == DownloadStatusEnum.SUCCESSFUL,
+                    DownloadTrackModel.file_path.is_not(None),  # type: ignore
+                )
+            )
+            updates: list[dict] = []
+            # fetched up front, the batches commit while we go
+            downloads = orm.exec(downloads_qs).fetchall()
+            for download_id, file_path, platform_id in downloads:
+                if self.is_stored(file_path):
+                    result.already_migrated += 1
+                    continue
+                source = Path(file_path)
+                if file_path in moved:
+                    target = moved[file_path]
+                elif source.exists():
+                    target = moved[file_path] = self.add_object(source)
+                else:
+                    path = self.track_path(platform_id, source.suffix)
+                    if not path.exists():
+                        result.missing += 1
+                        continue
+                    target = path
+                new_path = self.link_track(target, platform_id)
+                updates.append({"id": download_id, "file_path": str(new_path)})
+                if len(updates) >= MIGRATION_BATCH_SIZE:
+                    result.migrated += self.save_paths(orm, updates)
+                    updates = []
+            result.migrated += self.save_paths(orm, updates)
+        result.deduplicated = self.stats.deduplicated - deduplicated
+        logger.info("storage migration %s", result)
+        return result
+
+    @staticmethod
+    def save_paths(orm: Session, updates: list[dict]) -> int:
+        if updates:
+            # ORM bulk UPDATE by primary key, one executemany per batch
+            orm.execute(update(DownloadTrackModel), updates)
+            orm.commit()
+        return len(updates)
+
+
+track_storage = TrackStorage()
@@ -1,8 +1,8 @@
-import threading
 from sqlmodel import Session, case, select
 from app.core.logging import get_logger
-from app.download_manager import soundcloud_downloader
 from app.download_manager.manager import DownloadManager
+from app.download_manager.playlist_index import playlist_index
+from app.download_manager.scheduler import PRIORITY_PLAYLIST
 from app.models.playlist import DownloadStatusEnum, DownloadTrackModel
 
 logger = get_logger(__name__)
@@ -31,17 +31,10 @@ async def add_downloads_to_download_manager(
     downloads = orm.exec(downloads_qs).fetchall()
 
     for download in downloads:
-        ctx = soundcloud_downloader.DownloadContext(
-            progress_reports=download_manager.progress_reports,
-            progress_event=download_manager.progress_event,
-            cancel_event=threading.Event(),
-            download_track_id=download.id or 0,
-        )
         await download_manager.add_to_queue(
             download.id or -1,
-            soundcloud_downloader.download(ctx),  # type: ignore
-            ctx.cancel_event,
-            -1,
+            PRIORITY_PLAYLIST,
+            playlist_index.playlist_for(download.track_id),
         )
 
     logger.info(
@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import time
+from datetime import datetime, time as day_time
+
+from app.core import config
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SCHEDULE_INTERVAL = 60  # seconds between time-of-day schedule checks
+
+Schedule = list[tuple[day_time, day_time, int]]
+
+
+class BandwidthLimiter:
+    """Process-wide download budget in bytes/s, 0 is unlimited
+
+    GCRA style: every transfer pushes a shared "theoretical arrival time"
+    forward by size / rate and the caller sleeps for whatever runs more
+    than `burst` seconds ahead. The state lives in shared memory, so yt-dlp
+    threads, the event loop and `DownloadProcessPool` workers draw from one
+    budget. Player streams are charged without waiting, downloads absorb
+    the debt.
+    """
+
+    def __init__(self, rate: int, burst: float) -> None:
+        context = multiprocessing.get_context("spawn")
+        # [rate, theoretical arrival time]
+        self._state = context.RawArray("d", [float(rate), 0.0])
+        self._lock = context.Lock()
+        self.burst = burst
+
+    @property
+    def rate(self) -> int:
+        return int(self._state[0])
+
+    def set_rate(self, rate: int) -> None:
+        if rate == self.rate:
+            return
+        logger.info("bandwidth limit %d -> %d B/s", self.rate, rate)
+        with self._lock:
+            self._state[0] = float(rate)
+            self._state[1] = 0.0
+
+    def reserve(self, size: int) -> float:
+        """Take `size` bytes from the budget, returns seconds to wait"""
+        with self._lock:
+            rate = self._state[0]
+            if rate <= 0 or size <= 0:
+                return 0.0
+            now = time.monotonic()
+            arrival = max(self._state[1], now) + size / rate
+            self._state[1] = arrival
+        return max(arrival - now - self.burst, 0.0)
+
+    def charge(self, size: int) -> None:
+        """Priority traffic, counted against the budget but never delayed"""
+        self.reserve(size)
+
+    def throttle(self, size: int) -> None:
+        delay = self.reserve(size)
+        if delay:
+            time.sleep(delay)
+
+    async def wait(self, size: int) -> None:
+        delay = self.reserve(size)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def parse_schedule(schedule: dict[str, int]) -> Schedule:
+    """`{"HH:MM-HH:MM": bytes/s}`, a window ending before it starts wraps
+    past midnight"""
+    windows = []
+    for window, rate in schedule.items():
+        start, end = window.split("-")
+        windows.append(
+            (day_time.fromisoformat(start), day_time.fromisoformat(end), rate)
+        )
+    return windows
+
+
+def scheduled_rate(schedule: Schedule, default: int, now: datetime) -> int:
+    current = now.time()
+    for start, end, rate in schedule:
+        if start <= end:
+            if start <= current < end:
+                return rate
+        elif current >= start or current < end:
+            return rate
+    return default
+
+
+async def follow_schedule(limiter: BandwidthLimiter, schedule: Schedule) -> None:
+    while True:
+        limiter.set_rate(
+            scheduled_rate(schedule, config.settings.bandwidth_limit, datetime.now())
+        )
+        await asyncio.sleep(SCHEDULE_INTERVAL)
+
+
+bandwidth_limiter = BandwidthLimiter(
+    config.settings.bandwidth_limit, config.settings.bandwidth_burst
+)
@@ -0,0 +1,223 @@
+import asyncio
+import dataclasses
+import hashlib
+import sqlite3
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# per-session credentials, they must not split the cache
+VOLATILE_PARAMS = {"client_id", "app_version", "app_locale"}
+# buffered `accessed_at` updates written in one transaction
+TOUCH_BATCH = 256
+
+T = TypeVar("T")
+
+
+def cache_key(url: str, auth: str = "") -> str:
+    """URL without credentials and with sorted query params, scoped to `auth`
+
+    What upstream returns depends on the account asking, private tracks
+    included, so every `Authorization` value, none too, gets its own entries.
+    Only a hash of it is stored.
+    """
+    parts = urlsplit(url)
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in VOLATILE_PARAMS
+    )
+    identity = hashlib.sha256(auth.encode()).hexdigest()[:32]
+    return urlunsplit(
+        (parts.scheme, parts.netloc, parts.path, urlencode(query), identity)
+    )
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """Headers for a conditional request"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+class ResponseCache:
+    """SQLite backed response bodies, evicted least recently used first
+
+    The connection is opened on first use so importing this module never
+    touches the disk. All of its I/O runs on one worker thread, off the
+    event loop. Reads don't write, the entries they hit are remembered and
+    their `accessed_at` stamped in batches, before an eviction at the latest.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.size = 0
+        self._connection: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="http-cache")
+        self._accessed: dict[str, float] = {}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, "
+                "last_modified TEXT, expires_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self.size = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+        return self._connection
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get(self, key: str) -> CacheEntry | None:
+        return await self._run(self._get, key)
+
+    async def set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: int,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        if len(body) > self.max_bytes:
+            return
+        await self._run(self._set, key, body, ttl, etag, last_modified)
+
+    async def touch(self, key: str, ttl: int) -> None:
+        """Extend an entry upstream confirmed with a 304"""
+        await self._run(self._touch, key, ttl)
+
+    async def entries(self) -> int:
+        return await self._run(self._entries)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown()
+
+    def _get(self, key: str) -> CacheEntry | None:
+        row = self.connection.execute(
+            "SELECT body, etag, last_modified, expires_at FROM responses "
+            "WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if not row:
+            return None
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= TOUCH_BATCH:
+            self._flush_accessed()
+            self.connection.commit()
+        return CacheEntry(*row)
+
+    def _set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: int,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> None:
+        now = time.time()
+        self._accessed.pop(key, None)
+        previous = self.connection.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, body, etag, last_modified, expires_at, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, body, etag, last_modified, now + ttl, now, len(body)),
+        )
+        self.size += len(body) - (previous[0] if previous else 0)
+        self.stats.stores += 1
+        self._flush_accessed()
+        self._evict()
+        self.connection.commit()
+
+    def _touch(self, key: str, ttl: int) -> None:
+        self.connection.execute(
+            "UPDATE responses SET expires_at = ? WHERE key = ?",
+            (time.time() + ttl, key),
+        )
+        self.connection.commit()
+
+    def _flush_accessed(self) -> None:
+        if not self._accessed:
+            return
+        self.connection.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> None:
+        # drop down to 90% of the cap so every store doesn't evict again
+        target = self.max_bytes * 0.9
+        if self.size <= self.max_bytes:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        )
+        evicted = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats.evictions += len(evicted)
+        logger.info("response cache evicted %d entries", len(evicted))
+
+    def _entries(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._flush_accessed()
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,194 @@
+import os
+import re
+import secrets
+from collections.abc import Callable
+from pathlib import Path
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# more ranges than this, even after merging, and the whole file is sent
+MAX_RANGES = 16
+RANGE_SPEC = re.compile(r"^(\d*)-(\d*)$")
+
+ByteRange = tuple[int, int]  # [start, end)
+
+
+class RangeNotSatisfiable(Exception):
+    """The `Range` header is malformed or no range overlaps the file"""
+
+
+def parse_range_header(header: str, file_size: int) -> list[ByteRange] | None:
+    """Sorted, merged byte ranges of a `Range` header, None for the whole file
+
+    Handles suffix ranges (`bytes=-500`) and open ends (`bytes=500-`), a
+    range starting past the end is skipped as long as another one fits.
+    """
+    unit, _, range_set = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        # unknown units are ignored
+        return None
+    ranges: list[ByteRange] = []
+    for spec in range_set.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        match = RANGE_SPEC.match(spec)
+        if not match or match.group(1) == match.group(2) == "":
+            raise RangeNotSatisfiable(spec)
+        first, last = match.groups()
+        if not first:
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable(spec)
+            start, end = max(file_size - suffix, 0), file_size
+        else:
+            start = int(first)
+            end = int(last) + 1 if last else file_size
+            if last and end <= start:
+                raise RangeNotSatisfiable(spec)
+        if start >= file_size:
+            continue
+        ranges.append((start, min(end, file_size)))
+    if not ranges:
+        raise RangeNotSatisfiable(header)
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+class FileRangeResponse(Response):
+    """A file, whole or by byte ranges, with an exact `Content-Length`
+
+    Several ranges go out as `multipart/byteranges`. The bytes are read
+    with `os.pread` on a worker thread, `chunk_size` at a time, that's the
+    path under uvicorn, which offers neither `http.response.zerocopysend`
+    nor `http.response.pathsend`. Servers that do offer them get sendfile.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        file_size: int,
+        media_type: str,
+        ranges: list[ByteRange] | None,
+        chunk_size: int,
+        charge: Callable[[int], None] | None = None,
+    ) -> None:
+        self.path = path
+        self.file_size = file_size
+        self.media_type = media_type
+        self.chunk_size = chunk_size
+        self.charge = charge
+        self.background = None
+        self.ranges = ranges
+        # (part header, start, end) per range, then the closing boundary
+        self.parts: list[tuple[bytes, int, int]] = [(b"", 0, file_size)]
+        self.closing = b""
+        headers = {"Accept-Ranges": "bytes"}
+        if ranges is None:
+            self.status_code = 200
+            content_type = media_type
+        elif len(ranges) == 1:
+            self.status_code = 206
+            content_type = media_type
+            start, end = ranges[0]
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{file_size}"
+            self.parts = [(b"", start, end)]
+        else:
+            self.status_code = 206
+            boundary = secrets.token_hex(13)
+            content_type = f"multipart/byteranges; boundary={boundary}"
+            self.parts = [
+                (
+                    # parts after the first start on a new line
+                    (b"\r\n" if index else b"")
+                    + (
+                        f"--{boundary}\r\n"
+                        f"Content-Type: {media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end - 1}/{file_size}\r\n"
+                        "\r\n"
+                    ).encode("latin-1"),
+                    start,
+                    end,
+                )
+                for index, (start, end) in enumerate(ranges)
+            ]
+            self.closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        content_length = len(self.closing) + sum(
+            len(header) + end - start for header, start, end in self.parts
+        )
+        headers["Content-Type"] = content_type
+        headers["Content-Length"] = str(content_length)
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions", {})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if self.ranges is None and "http.response.pathsend" in extensions:
+            self._charge(self.file_size)
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        zerocopy = "http.response.zerocopysend" in extensions
+        with open(self.path, "rb") as file:
+            for header, start, end in self.parts:
+                if header:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": header,
+                            "more_body": True,
+                        }
+                    )
+                if zerocopy:
+                    self._charge(end - start)
+                    await send(
+                        {
+                            "type": "http.response.zerocopysend",
+                            "file": file,
+                            "offset": start,
+                            "count": end - start,
+                            "more_body": True,
+                        }
+                    )
+                    continue
+                while start < end:
+                    chunk = await anyio.to_thread.run_sync(
+                        os.pread,
+                        file.fileno(),
+                        min(self.chunk_size, end - start),
+                        start,
+                    )
+                    if not chunk:
+                        # truncated since the stat
+                        break
+                    start += len(chunk)
+                    self._charge(len(chunk))
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        await send({"type": "http.response.body", "body": self.closing})
+
+    def _charge(self, size: int) -> None:
+        if self.charge:
+            self.charge(size)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate follows the upstream (AIMD)
+
+    Every throttled response halves the rate down to `min_rate` and every
+    successful one adds `increase_step` back up to `max_rate`. A
+    `Retry-After` pauses all callers until it passes.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float,
+        increase_step: float = 0.1,
+    ) -> None:
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.increase_step = increase_step
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttled(self, retry_after: float | None = None) -> None:
+        previous_rate = self.rate
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + retry_after
+            )
+        logger.warning(
+            "throttled, rate %.2f -> %.2f req/s retry-after %s",
+            previous_rate,
+            self.rate,
+            retry_after,
+        )
@@ -1,10 +1,27 @@
 from app.core import config
 from app.models.settings import SettingsModel
-from aiohttp import ClientSession as BaseClientSession
+from aiohttp import ClientSession as BaseClientSession, TCPConnector
+
+
+def build_connector(limit_per_host: int | None = None) -> TCPConnector:
+    """Connector tuned for long-lived reuse against a handful of SoundCloud hosts"""
+    if limit_per_host is None:
+        limit_per_host = config.settings.http_connection_limit_per_host
+    return TCPConnector(
+        limit=config.settings.http_connection_limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=config.settings.http_dns_cache_ttl,
+        use_dns_cache=True,
+        keepalive_timeout=config.settings.http_keepalive_timeout,
+    )
 
 
 class ClientSession(BaseClientSession):
     def __init__(self, settings: SettingsModel | None, *args, **kw) -> None:
+        # requests in flight through `SoundCloudClient.session`
+        self.users = 0
+        # replaced after a settings change, closed once `users` drops to 0
+        self.retired = False
         if settings:
             kw["proxy"] = settings.get_http_proxy()
             kw["headers"] = settings.get_http_headers()
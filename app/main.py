@@ -1,11 +1,19 @@
 import asyncio
+import functools
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import select
 from app.core import config
 from app.core.logging import setup_logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.download_manager import soundcloud_downloader
+from app.download_manager.native_downloader import native_downloader
+from app.download_manager.process_pool import DownloadProcessPool
 from app.download_manager.manager import DownloadManager
+from app.download_manager.playlist_index import playlist_index
+from app.download_manager.retry import retry_scheduler
+from app.http.bandwidth import bandwidth_limiter, follow_schedule, parse_schedule
 from app.download_manager.utils import add_downloads_to_download_manager
 from app.models.settings import SettingsModel
 from app.services.playlist_service import router as playlist_router
@@ -13,6 +21,10 @@ from app.services.settings_service import router as settings_router
 from app.services.download_service import router as downloads_router
 from app.services.player_service import router as player_router
 from app.services.frontend_service import router as frontend_router
+from app.services.soundcloud_service import router as soundcloud_router
+from app.soundcloud.api import SoundCloudRateLimitError, response_cache
+from app.soundcloud.client import SoundCloudClient
+from app.soundcloud.download import ytdl_pool
 from app.core.db import create_db_and_tables, get_session
 from contextlib import asynccontextmanager
 
@@ -28,12 +40,51 @@ async def lifespan(app: FastAPI):
     concurrent_downloads = getattr(
         settings_obj, "concurrent_downloads", config.settings.concurrent_downloads
     )
-    app.state.downloader = DownloadManager(concurrent_downloads)
+    playlist_index.load(session)
+    app.state.soundcloud = SoundCloudClient()
+    ytdl_pool.max_idle = concurrent_downloads
+    ytdl_pool.limiter = bandwidth_limiter
+    app.state.download_pool = None
+    if config.settings.download_processes > 0:
+        app.state.download_pool = DownloadProcessPool(
+            config.settings.download_processes, bandwidth_limiter
+        )
+        app.state.download_pool.start()
+    app.state.downloader = DownloadManager(
+        concurrent_downloads,
+        functools.partial(
+            soundcloud_downloader.download,
+            sc_client=app.state.soundcloud,
+            process_pool=app.state.download_pool,
+        ),
+    )
     asyncio.create_task(app.state.downloader.worker())
+    asyncio.create_task(retry_scheduler.run(app.state.downloader))
+    if config.settings.bandwidth_schedule:
+        asyncio.create_task(
+            follow_schedule(
+                bandwidth_limiter, parse_schedule(config.settings.bandwidth_schedule)
+            )
+        )
+    if config.settings.download_autotune:
+        ytdl_pool.max_idle = config.settings.download_autotune_max
+        asyncio.create_task(
+            app.state.downloader.autotune(
+                config.settings.download_autotune_min,
+                config.settings.download_autotune_max,
+                config.settings.download_autotune_interval,
+            )
+        )
     asyncio.create_task(
         add_downloads_to_download_manager(session, app.state.downloader)
     )
     yield
+    await app.state.soundcloud.close()
+    await response_cache.close()
+    ytdl_pool.close()
+    await native_downloader.close()
+    if app.state.download_pool:
+        app.state.download_pool.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -52,8 +103,24 @@ app.include_router(prefix="/api", router=playlist_router)
 app.include_router(prefix="/api", router=settings_router)
 app.include_router(prefix="/api", router=downloads_router)
 app.include_router(prefix="/api", router=player_router)
+app.include_router(prefix="/api", router=soundcloud_router)
 app.include_router(router=frontend_router)
 
+
+@app.exception_handler(SoundCloudRateLimitError)
+async def soundcloud_rate_limit_handler(
+    request: Request, exc: SoundCloudRateLimitError
+):
+    headers = {}
+    if exc.retry_after:
+        headers["Retry-After"] = str(int(exc.retry_after) + 1)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": f"SoundCloud Is Throttling {exc.endpoint}"},
+        headers=headers,
+    )
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins="*",
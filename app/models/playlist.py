@@ -2,6 +2,7 @@ import enum
 from typing import Optional
 from datetime import datetime
 from fastapi import Request
+from sqlalchemy import text
 from sqlmodel import Field, SQLModel, Relationship, UniqueConstraint, Column, Enum
 
 from app.schemas.playlist import PlaylistSchema, TrackSchema
@@ -39,16 +40,35 @@ class PlaylistBaseModel(SQLModel):
     def update_from_schema(self, schema: PlaylistSchema):
         self.sqlmodel_update(schema.model_dump())
 
+    def has_revision(self, last_modified: datetime | None, track_count: int | None) -> bool:
+        # sqlite hands back naive datetimes while the API ones are aware
+        return (
+            last_modified is not None
+            and track_count == self.track_count
+            and last_modified.replace(tzinfo=None)
+            == self.last_modified.replace(tzinfo=None)
+        )
+
 
 class PlaylistModel(PlaylistBaseModel, table=True):
     __table_args__ = (
         UniqueConstraint("platform_id", "service", name="platform_id_service_unique"),
     )
     id: int | None = Field(primary_key=True)
+    # upstream state seen by the last complete tracks sync
+    synced_last_modified: datetime | None = Field(default=None)
+    synced_track_count: int | None = Field(default=None)
     tracks: list["TrackModel"] = Relationship(
         back_populates="playlists", link_model=PlaylistTrackLinkModel
     )
 
+    def is_unchanged_since_sync(self) -> bool:
+        return self.has_revision(self.synced_last_modified, self.synced_track_count)
+
+    def mark_synced(self) -> None:
+        self.synced_last_modified = self.last_modified
+        self.synced_track_count = self.track_count
+
 
 class PlaylistPublicModel(PlaylistBaseModel):
     id: int | None
@@ -103,6 +123,10 @@ class DownloadStatusEnum(str, enum.Enum):
 class DownloadTrackBaseModel(SQLModel):
     status: DownloadStatusEnum = Field(sa_column=Column(Enum(DownloadStatusEnum)))
     file_path: str | None = Field()
+    attempts: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    # set while a failed download waits for its automatic retry
+    next_attempt_at: datetime | None = Field(default=None)
+    last_error: str | None = Field(default=None)
 
 
 class DownloadTrackModel(DownloadTrackBaseModel, table=True):
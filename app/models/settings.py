@@ -1,6 +1,7 @@
-from sqlmodel import SQLModel, Field
+from sqlalchemy import text
+from sqlmodel import AutoString, SQLModel, Field
 from app.core import config
-from app.core.config import settings
+from app.core.config import DownloadBackend, settings
 
 
 class SettingBaseModel(SQLModel):
@@ -13,6 +14,11 @@ class SettingBaseModel(SQLModel):
     download_folder: str = Field(default=settings.download_folder)
     download_retries: int = Field(default=settings.download_retries)
     sync_interval: int = Field(default=settings.sync_interval)
+    download_backend: DownloadBackend = Field(
+        default=settings.download_backend,
+        sa_type=AutoString,
+        sa_column_kwargs={"server_default": text(f"'{settings.download_backend}'")},
+    )
 
     def get_http_headers(self) -> dict:
         headers = config.headers.copy()
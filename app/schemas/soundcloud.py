@@ -0,0 +1,136 @@
+"""Typed views over the SoundCloud api-v2 payloads
+
+Only the fields we store are declared, everything else in the payload is
+skipped by the parser. Fields are optional because upstream sends `null`
+or drops keys depending on the representation.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, RootModel
+
+from app.schemas.playlist import PlaylistSchema, TrackSchema
+
+
+class UserStruct(BaseModel):
+    full_name: str | None = None
+
+
+class TrackStruct(BaseModel):
+    id: int = 0
+    kind: str | None = None
+    title: str | None = None
+    permalink_url: str | None = None
+    duration: int | None = None
+    artwork_url: str | None = None
+    user: UserStruct | None = None
+
+    def to_schema(self) -> TrackSchema:
+        return TrackSchema(
+            platform_id=str(self.id),
+            url=self.permalink_url,
+            name=self.title or "SoundCloud",
+            artist_name=self.user.full_name if self.user else None,
+            album=None,
+            duration=self.duration or 0,
+            is_synced=False,
+            thumbnail=self.artwork_url,
+        )
+
+
+class TracksStruct(RootModel[list[TrackStruct]]): ...
+
+
+class PlaylistStruct(BaseModel):
+    id: int | str = -1
+    title: str | None = None
+    permalink_url: str | None = None
+    artwork_url: str | None = None
+    calculated_artwork_url: str | None = None
+    # kept as sent, they are compared as revisions
+    last_modified: str | None = None
+    last_updated: str | None = None
+    track_count: int | None = None
+    duration: int | None = None
+    user: UserStruct | None = None
+    tracks: list[TrackStruct] = []
+
+    @property
+    def artwork(self) -> str | None:
+        return self.artwork_url or self.calculated_artwork_url
+
+    @property
+    def revision(self) -> str | None:
+        return self.last_modified or self.last_updated
+
+    def to_schema(self, thumbnail: str | None) -> PlaylistSchema:
+        return PlaylistSchema(
+            platform_id=str(self.id),
+            duration=self.duration or 0,
+            is_synced=False,
+            last_modified=self.revision or datetime.now(),  # type: ignore
+            name=self.title or "SoundCloud",
+            owner=(self.user.full_name if self.user else None) or "SoundCloud",
+            track_count=self.track_count or len(self.tracks),
+            url=self.permalink_url or "",
+            thumbnail=thumbnail,
+            service="soundcloud",
+        )
+
+
+class TrackIdStruct(BaseModel):
+    id: int
+
+
+class PlaylistTracksIdsStruct(BaseModel):
+    """Playlist with its track stubs, the only part needed to diff a playlist"""
+
+    track_count: int | None = None
+    tracks: list[TrackIdStruct] = []
+
+
+class LibraryItemStruct(BaseModel):
+    playlist: PlaylistStruct | None = None
+    system_playlist: PlaylistStruct | None = None
+
+
+class LibraryPageStruct(BaseModel):
+    collection: list[LibraryItemStruct] = []
+    next_href: str | None = None
+
+
+class TrackLikeStruct(BaseModel):
+    track: TrackStruct | None = None
+
+
+class TrackLikesPageStruct(BaseModel):
+    collection: list[TrackLikeStruct] = []
+    next_href: str | None = None
+
+
+class VersionsStruct(BaseModel):
+    app: str | None = None
+
+
+class TranscodingFormatStruct(BaseModel):
+    protocol: str = ""
+    mime_type: str = ""
+
+
+class TranscodingStruct(BaseModel):
+    url: str
+    preset: str = ""
+    snipped: bool = False
+    format: TranscodingFormatStruct = TranscodingFormatStruct()
+
+
+class TrackMediaStruct(BaseModel):
+    transcodings: list[TranscodingStruct] = []
+
+
+class TrackStreamStruct(TrackStruct):
+    media: TrackMediaStruct = TrackMediaStruct()
+    track_authorization: str | None = None
+
+
+class StreamUrlStruct(BaseModel):
+    url: str
@@ -1,7 +1,6 @@
-from asyncio import sleep
 import asyncio
+from asyncio import sleep
 import json
-import threading
 from fastapi import HTTPException, Request, status
 from fastapi.encoders import jsonable_encoder
 
@@ -10,19 +9,30 @@ from fastapi.routing import APIRouter
 from sqlmodel import select
 from app.core.db import SessionDep
 from app.core.logging import get_logger
-from app.download_manager.manager import DownloadProgressReport
+from app.download_manager.progress import (
+    FINISHED_STATUSES,
+    DownloadProgressReport,
+    ProgressStore,
+    ProgressSubscriber,
+    ProgressSummary,
+)
+from app.download_manager.scheduler import PRIORITY_PLAYLIST, PRIORITY_TRACK
+from app.download_manager.storage import track_storage
 from app.models.playlist import (
     DownloadTrackDataModel,
     DownloadTrackModel,
     DownloadTrackPublicModel,
     DownloadStatusEnum,
     PlaylistModel,
+    PlaylistTrackLinkModel,
 )
 from app.models.playlist import TrackModel
-from app.download_manager import soundcloud_downloader
+from app.soundcloud.download import ytdl_pool
 router = APIRouter(prefix="/downloads")
 logger = get_logger(__name__)
 
+SSE_KEEPALIVE_INTERVAL = 15  # seconds, comment lines keep proxies from timing out
+
 @router.get("/", response_model=list[DownloadTrackPublicModel])
 async def downloads_list(orm: SessionDep):
     query = (
@@ -61,21 +71,15 @@ async def retry_download(id: int, orm: SessionDep, request: Request):
         )
 
     download_item.status = DownloadStatusEnum.DOWNLOADING
+    # a manual retry starts over with a fresh attempts budget
+    download_item.attempts = 0
+    download_item.next_attempt_at = None
+    download_item.last_error = None
     orm.add(download_item)
     orm.commit()
-    cancel_event = threading.Event()
-    ctx = soundcloud_downloader.DownloadContext(
-        progress_reports=request.app.state.downloader.progress_reports,
-        progress_event=request.app.state.downloader.progress_event,
-        cancel_event=cancel_event,
-        download_track_id=download_item.id or 0,
-    )
-
     await request.app.state.downloader.add_to_queue(
         download_item.id,
-        soundcloud_downloader.download(ctx),  # type: ignore
-        cancel_event,
-        -1,
+        PRIORITY_TRACK,
     )
 
     return download_item
@@ -107,44 +111,146 @@ async def download_track(track_id: int, orm: SessionDep, request: Request):
     )
     orm.add(download_item)
     orm.commit()
-    cancel_event = threading.Event()
-    ctx = soundcloud_downloader.DownloadContext(
-        progress_reports=request.app.state.downloader.progress_reports,
-        progress_event=request.app.state.downloader.progress_event,
-        cancel_event=cancel_event,
-        download_track_id=download_item.id or 0,
-    )
-
     await request.app.state.downloader.add_to_queue(
         download_item.id,
-        soundcloud_downloader.download(ctx),  # type: ignore
-        cancel_event,
-        -1,
+        PRIORITY_TRACK,
     )
 
     return download_item
 
+@router.get("/queue/")
+async def download_queue(request: Request):
+    """Running downloads first (position 0), then waiting ones in serving order"""
+    return request.app.state.downloader.queue_positions()
+
+
+@router.get("/stats/")
+async def download_stats():
+    """yt-dlp instance reuse and extraction vs transfer time"""
+    return ytdl_pool.stats
+
+
+@router.post("/storage/migrate/")
+async def migrate_storage():
+    """Move flat-layout downloads into the sharded store"""
+    if not track_storage.sharded:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Storage Layout Is Flat"
+        )
+    # hashing and moving files, keep it off the event loop
+    return await asyncio.to_thread(track_storage.migrate_library)
+
+
+@router.get("/progress-stats/")
+async def download_progress_stats(request: Request):
+    """Progress updates received vs published, loop wakeups and store size"""
+    progress: ProgressStore = request.app.state.downloader.progress
+    progress.evict()
+    return progress.stats
+
+
+@router.get("/summary/")
+async def download_summary(request: Request):
+    """Counts, bytes, throughput and ETA over all downloads"""
+    return request.app.state.downloader.progress.summary()
+
+
+@router.get("/summary/{playlist_id}/playlist")
+async def download_playlist_summary(playlist_id: int, request: Request):
+    """Like `/summary/` for the downloads of one playlist's tracks"""
+    return request.app.state.downloader.progress.summary(playlist_id)
+
+
+@router.get("/autotune/")
+async def download_autotune(request: Request):
+    """Current slot limit, last window's throughput and recent decisions"""
+    autotuner = request.app.state.downloader.autotuner
+    if not autotuner:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Autotune Is Disabled"
+        )
+    return autotuner.stats
+
+
+def last_event_id(request: Request) -> int | None:
+    try:
+        return int(request.headers["last-event-id"])
+    except (KeyError, ValueError):
+        return None
+
+
+def finished_reports(
+    orm: SessionDep, playlist_id: int
+) -> dict[int, DownloadProgressReport]:
+    """Finished downloads of the playlist's tracks from the DB, by track id"""
+    downloads_qs = (
+        select(DownloadTrackModel)
+        .join(  # type: ignore
+            PlaylistTrackLinkModel,
+            PlaylistTrackLinkModel.track_id == DownloadTrackModel.track_id,
+        )
+        .where(
+            PlaylistTrackLinkModel.playlist_id == playlist_id,
+            DownloadTrackModel.status.in_(FINISHED_STATUSES),  # type: ignore
+        )
+    )
+    return {
+        obj.track_id: DownloadProgressReport(
+            track_id=obj.track_id,
+            percent=100 if obj.status == DownloadStatusEnum.SUCCESSFUL else 0,
+            status=obj.status,
+        )
+        for obj in orm.exec(downloads_qs)
+    }
+
+
+def summary_event(summary: ProgressSummary) -> str:
+    return f"event: summary\ndata: {json.dumps(jsonable_encoder(summary))}\n\n"
+
+
+async def wait_for_progress(subscriber: ProgressSubscriber) -> bool:
+    try:
+        await asyncio.wait_for(subscriber.event.wait(), SSE_KEEPALIVE_INTERVAL)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
 @router.get("/progress-reports/")
 async def download_progress_reports(
     request: Request,
 ):
-    progress_reports: dict[int, DownloadProgressReport] = (
-        request.app.state.downloader.progress_reports
-    )
-
-    async def progress_generator():
-        while True:
-            if await request.is_disconnected():
-                break
+    """Progress SSE, a snapshot on connect then only the changed reports
 
-            await request.app.state.downloader.progress_event.wait()
-            request.app.state.downloader.progress_event.clear()
+    Every message carries an `id`, a reconnecting client sending it back as
+    `Last-Event-ID` gets what changed since instead of a snapshot. Only
+    running and recently finished downloads are streamed, the rest are
+    listed by `/downloads/`. Each message is followed by a `summary` event
+    with the totals of `/downloads/summary/`.
+    """
+    progress: ProgressStore = request.app.state.downloader.progress
 
-            progresses = progress_reports.copy()
-            data = json.dumps(jsonable_encoder(progresses))
-
-            yield f"data: {data}\n\n"
-            await sleep(0.5)
+    async def progress_generator():
+        # subscribed only once the response is streamed, so the `finally`
+        # always runs, even when the client is gone before the first message
+        subscriber = progress.subscribe(last_event_id(request))
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+
+                if not await wait_for_progress(subscriber):
+                    yield ": keepalive\n\n"
+                    continue
+
+                seq, progresses = progress.next_message(subscriber)
+                data = json.dumps(jsonable_encoder(progresses))
+
+                yield f"id: {seq}\ndata: {data}\n\n"
+                yield summary_event(progress.summary())
+                await sleep(0.5)
+        finally:
+            progress.unsubscribe(subscriber)
 
     return StreamingResponse(progress_generator(), media_type="text/event-stream")
 
@@ -153,44 +259,42 @@ async def download_progress_reports(
 async def download_playlist_progress_report(
     playlist_id: int, request: Request, orm: SessionDep
 ):
-    progress_reports: dict[int, DownloadProgressReport] = (
-        request.app.state.downloader.progress_reports
-    )
-    playlist_qs = select(PlaylistModel).where(PlaylistModel.id == playlist_id)
-    playlist_obj = orm.exec(playlist_qs).one_or_none()
-    if not playlist_obj:
+    """Like `/progress-reports/` for one playlist, keyed by track id"""
+    progress: ProgressStore = request.app.state.downloader.progress
+    playlist_qs = select(PlaylistModel.id).where(PlaylistModel.id == playlist_id)
+    if orm.exec(playlist_qs).one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Playlist Not Found"
         )
-    tracks_ids_lookup = set([obj.id for obj in playlist_obj.tracks])
-
-    async def progress_generator(tracks_ids_lookup):
-        while True:
-            if await request.is_disconnected():
-                break
-
-            # Refresh items when this api start sooner then sync tracks API
-            # if it be disabled it has a chance that don't show updated data
-            if not tracks_ids_lookup:
-                orm.refresh(playlist_obj)
-                tracks_ids_lookup = set([obj.id for obj in playlist_obj.tracks])
-
-            await request.app.state.downloader.progress_event.wait()
-            request.app.state.downloader.progress_event.clear()
-
-            current = progress_reports.copy()
-            playlist_progress = {
-                obj.track_id: obj
-                for obj in current.values()
-                if obj.track_id in tracks_ids_lookup
-            }
-            data = json.dumps(jsonable_encoder(playlist_progress))
-            yield f"data: {data}\n\n"
-            await sleep(0.5)
-
-    return StreamingResponse(
-        progress_generator(tracks_ids_lookup), media_type="text/event-stream"
-    )
+
+    async def progress_generator():
+        # routed by `playlist_index`, tracks synced later are picked up too
+        subscriber = progress.subscribe(last_event_id(request), playlist_id)
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+
+                if not await wait_for_progress(subscriber):
+                    yield ": keepalive\n\n"
+                    continue
+
+                seq, current = progress.next_message(subscriber)
+                playlist_progress = {}
+                if subscriber.behind:
+                    # finished too long ago to still be in the store
+                    playlist_progress = finished_reports(orm, playlist_id)
+                playlist_progress.update(
+                    {obj.track_id: obj for obj in current.values()}
+                )
+                data = json.dumps(jsonable_encoder(playlist_progress))
+                yield f"id: {seq}\ndata: {data}\n\n"
+                yield summary_event(progress.summary(playlist_id))
+                await sleep(0.5)
+        finally:
+            progress.unsubscribe(subscriber)
+
+    return StreamingResponse(progress_generator(), media_type="text/event-stream")
 
 
 @router.post("/playlists/{playlist_id}/tracks", response_model=list[DownloadTrackModel])
@@ -230,27 +334,12 @@ async def download_playlist(playlist_id: int, orm: SessionDep, request: Request)
         len(download_items),
     )
     logger.info("Start Adding Downloads Items To Download Queue")
-    download_tasks = []
     for download in download_items:
-        cancel_event = threading.Event()
-        ctx = soundcloud_downloader.DownloadContext(
-            progress_reports=request.app.state.downloader.progress_reports,
-            progress_event=request.app.state.downloader.progress_event,
-            cancel_event=cancel_event,
-            download_track_id=download.id or 0,
+        await request.app.state.downloader.add_to_queue(
+            download.id,
+            PRIORITY_PLAYLIST,
+            playlist_id,
         )
-
-        task = asyncio.create_task(
-            request.app.state.downloader.add_to_queue(
-                download.id,
-                soundcloud_downloader.download(ctx),  # type: ignore
-                cancel_event,
-                -1,
-            )
-        )
-        download_tasks.append(task)
-
-    await asyncio.gather(*download_tasks)
     logger.info("Start Adding Downloads Items To Download Queue Ended")
 
     return download_items
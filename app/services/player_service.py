@@ -5,8 +5,9 @@ from sqlmodel import select
 from app.core import config
 from app.core.db import SessionDep
 from app.core.logging import get_logger
+from app.http.bandwidth import bandwidth_limiter
+from app.http.ranges import FileRangeResponse, RangeNotSatisfiable, parse_range_header
 from app.models.playlist import DownloadStatusEnum, TrackModel
-from fastapi.responses import StreamingResponse
 
 from mimetypes import guess_type
 
@@ -14,26 +15,8 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/player")
 
 
-def file_streamer(file_path: Path, start: int, end: int, chunk_size: int):
-    total_size = end - start
-    logger.info(
-        "Start Streaming File %s Range %d-%d Chunk-Size %d",
-        file_path,
-        start,
-        end,
-        chunk_size,
-    )
-    with open(file_path, "rb") as file:
-        file.seek(start)
-        while total_size >= 0:
-            total_size -= min(chunk_size, chunk_size)
-            chunk = file.read(min(chunk_size, chunk_size))
-            yield chunk
-    logger.info("Ended Streaming File :%s ", file_path)
-
-
 @router.head("/{track_id}/play")
-async def play_track_head(track_id: int, orm: SessionDep):
+async def play_track_head(track_id: int, orm: SessionDep, request: Request):
     track_query = select(TrackModel).where(TrackModel.id == track_id)
     track_obj = orm.exec(track_query).one_or_none()
 
@@ -46,6 +29,9 @@ async def play_track_head(track_id: int, orm: SessionDep):
         or not track_obj.download.file_path
         or track_obj.download.status != DownloadStatusEnum.SUCCESSFUL
     ):
+        if track_obj.download:
+            # someone is waiting for this track, move it ahead of the backlog
+            request.app.state.downloader.promote(track_obj.download.id)
         raise HTTPException(
             status_code=status.HTTP_425_TOO_EARLY, detail="Track Is Not Downloaded Yet"
         )
@@ -82,6 +68,9 @@ async def play_track(track_id: int, orm: SessionDep, request: Request):
         or not track_obj.download.file_path
         or track_obj.download.status != DownloadStatusEnum.SUCCESSFUL
     ):
+        if track_obj.download:
+            # someone is waiting for this track, move it ahead of the backlog
+            request.app.state.downloader.promote(track_obj.download.id)
         raise HTTPException(
             status_code=status.HTTP_425_TOO_EARLY, detail="Track Is Not Downloaded Yet"
         )
@@ -94,44 +83,29 @@ async def play_track(track_id: int, orm: SessionDep, request: Request):
     file_path = Path(track_obj.download.file_path)
     file_size: int = file_path.stat().st_size
 
-    range_header = request.headers.get("range", "").lstrip("bytes=")
-    if not range_header:
-        start_range, end_range = 0, file_size - 1
-    else:
-        start_range, end_range = range_header.split("-")
+    ranges = None
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            ranges = parse_range_header(range_header, file_size)
+        except RangeNotSatisfiable:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Range Not Satisfiable",
+                headers={"Content-Range": f"bytes */{file_size}"},
+            )
 
-        # browser can send empty range empty so we set fallback
-        start_range = start_range or 0
-        end_range = end_range or file_size - 1
-
-        # parse to int
-        start_range = int(start_range)
-        end_range = int(end_range)
-
-    # headers values
     file_type, _ = guess_type(file_path)
     # fallback type when type can't find
     file_type = file_type or "application/octet-stream"
 
-    content_range = f"bytes {start_range}-{end_range}/{file_size}"
-
-    headers = {
-        "Accept-Ranges": "bytes",
-        "Content-Type": file_type,
-        "Content-Range": content_range,
-    }
-
-    return StreamingResponse(
-        status_code=status.HTTP_206_PARTIAL_CONTENT
-        if range_header
-        else status.HTTP_200_OK,
-        headers=headers,
-        content=file_streamer(
-            file_path,
-            start_range,
-            end_range,
-            config.settings.stream_chunk_size,
-        ),
+    logger.info("Streaming File %s Ranges %s", file_path, ranges)
+    return FileRangeResponse(
+        file_path,
+        file_size,
+        file_type,
+        ranges,
+        config.settings.stream_chunk_size,
+        # the player goes first, downloads make up for its bytes
+        charge=bandwidth_limiter.charge,
     )
-
-
@@ -1,9 +1,8 @@
 from fastapi import APIRouter, Path, HTTPException, Request, status
 from typing import Annotated
-from app.core import config
 from app.core.db import SessionDep
 from app.core.logging import get_logger
-from app.http.session import ClientSession
+from app.download_manager.playlist_index import playlist_index
 from app.models.playlist import (
     PlaylistModel,
     PlaylistPublicModel,
@@ -11,15 +10,17 @@ from app.models.playlist import (
     TrackPublicModel,
 )
 from app.models.settings import SettingsModel
-from app.soundcloud.auth import SoundCloudAuth, get_app_version, get_client_id
+from app.soundcloud.client import SoundCloudClient
 from app.soundcloud.playlist import (
     get_liked_playlist,
-    get_liked_tracks,
-    get_playlists,
-    get_playlist_tracks,
+    iter_liked_tracks,
+    iter_playlists,
+    get_playlist_tracks_ids,
+    get_tracks,
     get_unassigned_tracks_playlist,
 )
-from sqlmodel import select, or_
+from app.schemas.playlist import PlaylistSchema, TrackSchema
+from sqlmodel import Session, select
 
 router = APIRouter(prefix="/playlists")
 logger = get_logger(__name__)
@@ -55,47 +56,28 @@ async def sync_playlists(orm: SessionDep, request: Request):
 
     settings_query = select(SettingsModel)
     settings = orm.exec(settings_query).one_or_none()
-    async with ClientSession(settings=settings) as session:
-        client_id = await get_client_id(session)
-        app_version = await get_app_version(session)
-        sc_auth = SoundCloudAuth(
-            client_id,
-            app_version,
-            oauth=settings.get_soundcloud_oauth()
-            if settings
-            else config.settings.soundcloud_oauth,
-        )
-        res = await get_playlists(session, sc_auth)
-        liked_playlist = await get_liked_playlist(request, session, sc_auth)
-        res.append(liked_playlist)
-    # TODO: add order field to show custom playlist on on top
-    res = filter(bool, res)
-    items_id = [obj.platform_id for obj in res]
-    logger.info("playlists ids: %s", items_id)
+    sc_client: SoundCloudClient = request.app.state.soundcloud
+    async with sc_client.session(settings) as session:
+        sc_auth = await sc_client.get_auth(settings)
+        created_playlists = 0
+        updated_playlists = 0
+        skipped_playlists = 0
+        total = 0
+        # each library page is stored on arrival, the likes playlist goes last
+        async for page in iter_playlists(session, sc_auth):
+            created, updated, skipped = upsert_playlists(orm, page)
+            orm.commit()
+            created_playlists += created
+            updated_playlists += updated
+            skipped_playlists += skipped
+            total += len(page)
 
-    search_query = (
-        select(PlaylistModel)
-        .where(PlaylistModel.service == "soundcloud")
-        .where(PlaylistModel.platform_id.in_(items_id))  # type: ignore
-    )
-    search_result = orm.exec(search_query).fetchall()
-
-    lookup_objs = {obj.platform_id: obj for obj in search_result}
-    updated_items = []
-    created_items = []
-
-    for obj in res:
-        item = lookup_objs.get(str(obj.platform_id))
-        if obj.platform_id == "soundcloud-likes":
-            logger.info("Likes %s", item)
-        if item:
-            item.update_from_schema(obj)
-            updated_items.append(item)
-        else:
-            new_item = PlaylistModel.from_schema(obj)
-            new_item.service = "soundcloud"
-            orm.add(new_item)
-            created_items.append(new_item)
+        liked_playlist = await get_liked_playlist(request, session, sc_auth)
+        created, updated, skipped = upsert_playlists(orm, [liked_playlist])
+        created_playlists += created
+        updated_playlists += updated
+        skipped_playlists += skipped
+        total += 1
 
     # Handle Custom Playlists
     unassigned_tracks = await get_unassigned_tracks_playlist(request, orm)
@@ -114,15 +96,19 @@ async def sync_playlists(orm: SessionDep, request: Request):
     orm.commit()
 
     return {
-        "updated_playlists": len([]),
-        "created_playlists": len([]),
-        "total": len([]),
+        "updated_playlists": updated_playlists,
+        "created_playlists": created_playlists,
+        "skipped_playlists": skipped_playlists,
+        "total": total,
     }
 
 
 @router.post("/{id}/sync/")
 async def sync_playlist_tracks(
-    id: Annotated[int, Path(title="ID or playlist")], orm: SessionDep
+    id: Annotated[int, Path(title="ID or playlist")],
+    orm: SessionDep,
+    request: Request,
+    force: bool = False,
 ):
     playlist_obj_statement = select(PlaylistModel).where(PlaylistModel.id == id)
     playlist_obj = orm.exec(playlist_obj_statement).one_or_none()
@@ -134,56 +120,165 @@ async def sync_playlist_tracks(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="This Playlist Is Offline"
         )
+    is_likes = playlist_obj.platform_id == "soundcloud-likes"
+    if not force and not is_likes and playlist_obj.is_unchanged_since_sync():
+        logger.info("playlist %d unchanged since last sync, skipped", id)
+        return {
+            "created_tracks": 0,
+            "updated_tracks": 0,
+            "removed_tracks": 0,
+            "unchanged_tracks": playlist_obj.track_count,
+            "skipped_tracks": playlist_obj.track_count,
+            "skipped_playlists": 1,
+            "total": playlist_obj.track_count,
+        }
+
     settings_query = select(SettingsModel)
     settings = orm.exec(settings_query).one_or_none()
-    async with ClientSession(settings=settings) as session:
-        client_id = await get_client_id(session)
-        app_version = await get_app_version(session)
-        sc_auth = SoundCloudAuth(
-            client_id,
-            app_version,
-            oauth=settings.get_soundcloud_oauth()
-            if settings
-            else config.settings.soundcloud_oauth,
-        )
-        if playlist_obj.platform_id == "soundcloud-likes":
-            res = await get_liked_tracks(session, sc_auth)
+    sc_client: SoundCloudClient = request.app.state.soundcloud
+    async with sc_client.session(settings) as session:
+        sc_auth = await sc_client.get_auth(settings)
+
+        created_tracks = 0
+        updated_tracks = 0
+        removed_tracks = 0
+        skipped_tracks = 0
+        total = 0
+        if is_likes:
+            # pages are committed on arrival so an interrupted sync keeps its progress
+            async for page in iter_liked_tracks(session, sc_auth):
+                created, updated = upsert_playlist_tracks(orm, playlist_obj, page)
+                orm.commit()
+                created_tracks += created
+                updated_tracks += updated
+                total += len(page)
+        else:
+            upstream_ids = await get_playlist_tracks_ids(
+                playlist_obj.platform_id or "", session, sc_auth, playlist_obj.url
+            )
+            if not upstream_ids and playlist_obj.track_count:
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail="Can't Fetch Playlist Tracks",
+                )
+            upstream_lookup = set(upstream_ids)
+            linked_tracks = {obj.platform_id: obj for obj in playlist_obj.tracks}
+
+            removed_ids = []
+            for platform_id, track in linked_tracks.items():
+                if platform_id not in upstream_lookup:
+                    playlist_obj.tracks.remove(track)
+                    removed_ids.append(track.id)
+            removed_tracks = len(removed_ids)
+
+            # only tracks new to this playlist are hydrated
+            added_ids = [i for i in upstream_ids if i not in linked_tracks]
+            added_tracks = await get_tracks(added_ids, session, sc_auth)
+            created_tracks, updated_tracks = upsert_playlist_tracks(
+                orm, playlist_obj, added_tracks
+            )
+            skipped_tracks = len(upstream_lookup) - len(added_ids)
+            total = skipped_tracks + len(added_tracks)
+
+            if len(added_tracks) == len(added_ids):
+                playlist_obj.mark_synced()
+            else:
+                logger.warning(
+                    "playlist %d hydrated %d/%d new tracks, sync cursor not stored",
+                    id,
+                    len(added_tracks),
+                    len(added_ids),
+                )
+            orm.add(playlist_obj)
+            orm.commit()
+            playlist_index.unlink(id, removed_ids)
+
+    return {
+        "created_tracks": created_tracks,
+        "updated_tracks": updated_tracks,
+        "removed_tracks": removed_tracks,
+        "unchanged_tracks": total - (created_tracks + updated_tracks),
+        "skipped_tracks": skipped_tracks,
+        "skipped_playlists": 0,
+        "total": total,
+    }
+
+
+def upsert_playlists(
+    orm: Session, playlists: list[PlaylistSchema]
+) -> tuple[int, int, int]:
+    """Store a page of soundcloud playlists, returns (created, updated, skipped)"""
+    # TODO: add order field to show custom playlist on on top
+    items_id = [obj.platform_id for obj in playlists]
+    logger.info("playlists ids: %s", items_id)
+
+    search_query = (
+        select(PlaylistModel)
+        .where(PlaylistModel.service == "soundcloud")
+        .where(PlaylistModel.platform_id.in_(items_id))  # type: ignore
+    )
+    search_result = orm.exec(search_query).fetchall()
+
+    lookup_objs = {obj.platform_id: obj for obj in search_result}
+    created_items = 0
+    updated_items = 0
+    skipped_items = 0
+
+    for obj in playlists:
+        item = lookup_objs.get(str(obj.platform_id))
+        if obj.platform_id == "soundcloud-likes":
+            logger.info("Likes %s", item)
+        if item and item.has_revision(obj.last_modified, obj.track_count):
+            skipped_items += 1
+        elif item:
+            item.update_from_schema(obj)
+            updated_items += 1
         else:
-            res = await get_playlist_tracks(playlist_obj.url or "", session, sc_auth)
+            new_item = PlaylistModel.from_schema(obj)
+            new_item.service = "soundcloud"
+            orm.add(new_item)
+            lookup_objs[obj.platform_id] = new_item
+            created_items += 1
 
-    created_tracks = []
-    updated_tracks = []
+    return created_items, updated_items, skipped_items
 
-    tracks_ids = {obj.platform_id for obj in res}
 
+def upsert_playlist_tracks(
+    orm: Session, playlist_obj: PlaylistModel, tracks: list[TrackSchema]
+) -> tuple[int, int]:
+    """Link a page of tracks to the playlist, returns (created, updated)
+
+    The new links go to `playlist_index` once the tracks have ids.
+    """
+    tracks_ids = {obj.platform_id for obj in tracks}
     tracks_statement = select(TrackModel).where(
-        or_(TrackModel.playlists.any(id=id), TrackModel.platform_id.in_(tracks_ids))  # type: ignore
+        TrackModel.platform_id.in_(tracks_ids)  # type: ignore
     )
-    tracks = orm.exec(tracks_statement).fetchall()
+    tracks_objs_lookup_ids = {
+        obj.platform_id: obj for obj in orm.exec(tracks_statement).fetchall()
+    }
 
-    tracks_objs_lookup_ids = {obj.platform_id: obj for obj in tracks}
-    for obj in res:
+    created_tracks = 0
+    updated_tracks = 0
+    linked: list[TrackModel] = []
+    for obj in tracks:
         item = tracks_objs_lookup_ids.get(obj.platform_id)
 
-        if item and item.platform_id not in tracks_ids:
-            item.playlists.remove(playlist_obj)
-            updated_tracks.append(item)
-        elif item and playlist_obj in item.playlists:
+        if item and playlist_obj in item.playlists:
             continue
-        elif item and playlist_obj not in item.playlists:
+        elif item:
             item.playlists.append(playlist_obj)
-            updated_tracks.append(item)
+            linked.append(item)
+            updated_tracks += 1
         else:
             new_item = TrackModel.from_schema(obj)
             new_item.playlists = [playlist_obj]
             orm.add(new_item)
-            created_tracks.append(new_item)
+            tracks_objs_lookup_ids[obj.platform_id] = new_item
+            linked.append(new_item)
+            created_tracks += 1
 
-    orm.commit()
-
-    return {
-        "created_tracks": len(created_tracks),
-        "updated_tracks": len(updated_tracks),
-        "unchanged_tracks": len(tracks) - (len(created_tracks) + len(updated_tracks)),
-        "total": len(tracks),
-    }
+    if linked:
+        orm.flush()
+        playlist_index.link(playlist_obj.id, [obj.id for obj in linked])  # type: ignore
+    return created_tracks, updated_tracks
@@ -1,7 +1,9 @@
 from fastapi import HTTPException, Request, status
 from fastapi.routing import APIRouter
 from sqlmodel import select
+from app.core import config
 from app.core.db import SessionDep
+from app.soundcloud.download import ytdl_pool
 from app.models.settings import (
     SettingsModel,
     SettingsPublicModel,
@@ -39,5 +41,10 @@ async def update_settings(
     await request.app.state.downloader.semaphore.update_limit(
         setting.concurrent_downloads
     )
+    if not config.settings.download_autotune:
+        # autotune keeps a pooled instance for every slot it may open
+        ytdl_pool.max_idle = setting.concurrent_downloads
+    # new proxy/OAuth on next use, running syncs finish on the old session
+    await request.app.state.soundcloud.get_session(setting)
 
     return setting
@@ -0,0 +1,29 @@
+import dataclasses
+from fastapi.routing import APIRouter
+
+from app.soundcloud.api import endpoint_stats, rate_limiter, response_cache
+
+router = APIRouter(prefix="/soundcloud")
+
+
+@router.get("/stats/")
+async def soundcloud_stats():
+    return {
+        "rate": rate_limiter.rate,
+        "max_rate": rate_limiter.max_rate,
+        "min_rate": rate_limiter.min_rate,
+        "endpoints": {
+            endpoint: dataclasses.asdict(stats)
+            for endpoint, stats in endpoint_stats.items()
+        },
+    }
+
+
+@router.get("/cache/")
+async def cache_stats():
+    return {
+        **dataclasses.asdict(response_cache.stats),
+        "entries": await response_cache.entries(),
+        "size_bytes": response_cache.size,
+        "max_bytes": response_cache.max_bytes,
+    }
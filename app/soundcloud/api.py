@@ -0,0 +1,210 @@
+import asyncio
+import dataclasses
+import random
+import re
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, TypeVar
+
+from aiohttp import ClientResponse, ClientSession
+from pydantic import BaseModel, ValidationError
+from yarl import URL
+
+from app.core import config
+from app.core.logging import get_logger
+from app.http.cache import ResponseCache, cache_key
+from app.http.ratelimit import AdaptiveRateLimiter
+
+if TYPE_CHECKING:
+    from app.soundcloud.auth import SoundCloudAuth
+
+logger = get_logger(__name__)
+
+StructT = TypeVar("StructT", bound=BaseModel)
+
+AUTH_ERROR_STATUSES = (401, 403)
+THROTTLED_STATUS = 429
+RETRY_STATUSES = (THROTTLED_STATUS, 500, 502, 503, 504)
+
+
+class SoundCloudRateLimitError(Exception):
+    """SoundCloud kept answering 429 after every retry"""
+
+    def __init__(self, endpoint: str, retry_after: float | None) -> None:
+        super().__init__(f"SoundCloud throttled {endpoint}")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+@dataclasses.dataclass
+class EndpointStats:
+    requests: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    retries: int = 0
+    bytes_received: int = 0
+
+
+rate_limiter = AdaptiveRateLimiter(
+    rate=config.settings.soundcloud_rate_limit,
+    burst=config.settings.soundcloud_rate_burst,
+    min_rate=config.settings.soundcloud_rate_limit_min,
+)
+endpoint_stats: dict[str, EndpointStats] = {}
+response_cache = ResponseCache(
+    config.settings.http_cache_path, config.settings.http_cache_max_bytes
+)
+
+
+def endpoint_name(url: str) -> str:
+    """`/users/123/track_likes` -> `/users/{id}/track_likes`"""
+    return re.sub(r"/[^/]*\d[^/]*", "/{id}", URL(url).path) or "/"
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int, retry_after: float | None) -> float:
+    # full jitter around the exponential step, never sooner than Retry-After
+    delay = config.settings.soundcloud_backoff_base * 2**attempt
+    delay = min(delay, config.settings.soundcloud_backoff_max)
+    delay *= random.uniform(0.5, 1.5)
+    return max(delay, retry_after or 0.0)
+
+
+@asynccontextmanager
+async def api_get(
+    session: ClientSession,
+    url: str,
+    retries: int = config.settings.soundcloud_max_retries,
+    endpoint: str | None = None,
+    **kwargs,
+) -> AsyncIterator[ClientResponse]:
+    """`session.get` behind the shared rate limiter
+
+    429 and 5xx responses are retried with jittered exponential backoff,
+    the last response is handed to the caller whatever its status unless
+    it is still a 429, which raises `SoundCloudRateLimitError`.
+    """
+    endpoint = endpoint or endpoint_name(url)
+    stats = endpoint_stats.setdefault(endpoint, EndpointStats())
+    attempt = 0
+    while True:
+        await rate_limiter.acquire()
+        stats.requests += 1
+        req = await session.get(url, **kwargs)
+        if req.status not in RETRY_STATUSES:
+            rate_limiter.on_success()
+            break
+
+        retry_after = parse_retry_after(req.headers.get("Retry-After"))
+        if req.status == THROTTLED_STATUS:
+            stats.throttled += 1
+            rate_limiter.on_throttled(retry_after)
+        else:
+            stats.server_errors += 1
+
+        if attempt >= retries and req.status != THROTTLED_STATUS:
+            # hand the 5xx to the caller, it already logs non-200 responses
+            break
+        req.release()
+        if attempt >= retries:
+            raise SoundCloudRateLimitError(endpoint, retry_after)
+
+        delay = backoff_delay(attempt, retry_after)
+        logger.warning(
+            "%s answered %d, retry %d/%d in %.2fs",
+            endpoint,
+            req.status,
+            attempt + 1,
+            retries,
+            delay,
+        )
+        stats.retries += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+    try:
+        yield req
+    finally:
+        stats.bytes_received += req.content.total_bytes
+        req.release()
+
+
+async def get_json(
+    session: ClientSession,
+    url: str,
+    struct: type[StructT],
+    sc_auth: "SoundCloudAuth | None" = None,
+) -> StructT | None:
+    """GET `url` and decode its body straight into `struct`
+
+    The body is read once as bytes and parsed once by pydantic's JSON
+    parser, fields missing from `struct` are never materialised. Endpoints
+    listed in `http_cache_ttls` are served from `response_cache`, per OAuth
+    token, while fresh and revalidated with ETag/Last-Modified once stale.
+    Returns None on non-200 responses and undecodable bodies.
+    """
+    endpoint = endpoint_name(url)
+    ttl = config.settings.http_cache_ttls.get(endpoint)
+    key = cache_key(url, session.headers.get("Authorization", ""))
+    entry = await response_cache.get(key) if ttl is not None else None
+    if entry and entry.is_fresh:
+        response_cache.stats.hits += 1
+        logger.info("%s served from cache", endpoint)
+        return decode(url, entry.body, struct)
+
+    headers = entry.validators if entry else {}
+    async with api_get(session, url, headers=headers) as req:
+        if req.status == 304 and entry:
+            response_cache.stats.revalidated += 1
+            await response_cache.touch(key, ttl or 0)
+            logger.info("%s revalidated from cache", endpoint)
+            return decode(url, entry.body, struct)
+
+        content = await req.read()
+        logger.info(
+            "%s response status %d length %d", endpoint, req.status, len(content)
+        )
+        if req.status != 200:
+            if sc_auth and req.status in AUTH_ERROR_STATUSES:
+                sc_auth.invalidate()
+            logger.error(
+                "Non-200 response from url %s content[2000]: %s",
+                url,
+                content[:2000].decode(errors="replace"),
+            )
+            return None
+
+        if ttl is not None:
+            response_cache.stats.misses += 1
+            await response_cache.set(
+                key,
+                content,
+                ttl,
+                etag=req.headers.get("ETag"),
+                last_modified=req.headers.get("Last-Modified"),
+            )
+
+    return decode(url, content, struct)
+
+
+def decode(url: str, content: bytes, struct: type[StructT]) -> StructT | None:
+    try:
+        return struct.model_validate_json(content)
+    except ValidationError as err:
+        logger.error("Undecodable response from url %s: %s", url, err)
+        return None
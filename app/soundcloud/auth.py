@@ -3,28 +3,41 @@ import aiohttp
 from aiohttp import ClientSession
 from app.core import config
 from app.core.logging import get_logger
+from app.schemas.soundcloud import VersionsStruct
+from app.soundcloud.api import api_get, get_json
 
 import re
+import time
 import dataclasses
 
 logger = get_logger(__name__)
 
 
-
-
 @dataclasses.dataclass
 class SoundCloudAuth:
     app_version: str
     client_id: str
     oauth: str = config.settings.soundcloud_oauth
+    # monotonic deadline, zero means it never got a valid client_id
+    expires_at: float = 0.0
+
     # third section of the OAuth is the user ID
     @property
     def user_id(self) -> str:
-        oauth_parts = config.settings.soundcloud_oauth.split("-")
-        if len(oauth_parts) < 2:
+        oauth_parts = (self.oauth or config.settings.soundcloud_oauth).split("-")
+        if len(oauth_parts) < 3:
             return ""
         return oauth_parts[2]
 
+    @property
+    def is_expired(self) -> bool:
+        return not self.client_id or time.monotonic() >= self.expires_at
+
+    def invalidate(self) -> None:
+        """Force a refresh on next use, called when the API answers 401/403"""
+        logger.warning("SoundCloud auth invalidated client_id %s", self.client_id)
+        self.expires_at = 0.0
+
 async def get_client_id(session: ClientSession) -> str:
 
     home_page_url: str = "https://soundcloud.com/"
@@ -32,7 +45,8 @@ async def get_client_id(session: ClientSession) -> str:
     timeout = aiohttp.ClientTimeout(10)
     logger.info("request to %s with timeout=%d", home_page_url, timeout.total)
     try:
-        async with session.get(
+        async with api_get(
+            session,
             home_page_url,
             timeout=timeout,
         ) as req:
@@ -66,16 +80,13 @@ async def get_client_id(session: ClientSession) -> str:
 async def get_app_version(session: ClientSession) -> str:
     url: str = "https://soundcloud.com/versions.json"
     logger.info("requesting %s", url)
-    async with session.get(url) as req:
-        html = await req.text()
-        json = await req.json()
-        logger.info("Versions Page status %d length %d", req.status, len(html))
-        version = json.get("app")
-        logger.info("App Version is %s", version or "NotFound")
-        if not version:
-            logger.error("Version NotFound data: %s", html)
-
-    return version
+    data = await get_json(session, url, VersionsStruct)
+    version = data.app if data else None
+    logger.info("App Version is %s", version or "NotFound")
+    if not version:
+        logger.error("Version NotFound data: %s", data)
+
+    return version or ""
 
 
 async def get_track_authorization() -> str: ...
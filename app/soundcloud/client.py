@@ -0,0 +1,106 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from app.core import config
+from app.core.logging import get_logger
+from app.http.session import ClientSession, build_connector
+from app.models.settings import SettingsModel
+from app.soundcloud.auth import SoundCloudAuth, get_app_version, get_client_id
+
+logger = get_logger(__name__)
+
+
+class SoundCloudClient:
+    """App-scoped HTTP session and cached `SoundCloudAuth`
+
+    The session is created lazily and rebuilt only when the settings that are
+    baked into it (proxy, OAuth) change, the replaced one is closed once the
+    last `session()` block using it exits. `client_id`/`app_version` are scraped
+    once and reused until `soundcloud_auth_ttl` passes or the auth gets
+    invalidated by a 401/403 from the API.
+    """
+
+    def __init__(self) -> None:
+        self._session: ClientSession | None = None
+        self._session_key: tuple | None = None
+        self._auth: SoundCloudAuth | None = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _settings_key(settings: SettingsModel | None) -> tuple:
+        if not settings:
+            return (config.settings.http_proxy, config.settings.soundcloud_oauth)
+        return (settings.get_http_proxy(), settings.get_soundcloud_oauth())
+
+    async def get_session(self, settings: SettingsModel | None) -> ClientSession:
+        key = self._settings_key(settings)
+        if self._session and not self._session.closed and self._session_key == key:
+            return self._session
+
+        async with self._lock:
+            if (
+                self._session
+                and not self._session.closed
+                and self._session_key == key
+            ):
+                return self._session
+            if self._session and not self._session.closed:
+                logger.info("settings changed, rebuilding SoundCloud http session")
+                await self._retire(self._session)
+            self._session = ClientSession(settings=settings, connector=build_connector())
+            self._session_key = key
+            # auth is bound to the OAuth of the session
+            self._auth = None
+        return self._session
+
+    @asynccontextmanager
+    async def session(
+        self, settings: SettingsModel | None
+    ) -> AsyncIterator[ClientSession]:
+        """The current session, kept open until the block exits even if the
+        settings change meanwhile"""
+        session = await self.get_session(settings)
+        session.users += 1
+        try:
+            yield session
+        finally:
+            session.users -= 1
+            if session.retired and not session.users:
+                await session.close()
+
+    @staticmethod
+    async def _retire(session: ClientSession) -> None:
+        session.retired = True
+        if not session.users:
+            await session.close()
+
+    async def get_auth(self, settings: SettingsModel | None) -> SoundCloudAuth:
+        # a rebuilt session drops the auth, so look the session up first
+        async with self.session(settings) as session:
+            if self._auth and not self._auth.is_expired:
+                return self._auth
+
+            async with self._lock:
+                if self._auth and not self._auth.is_expired:
+                    return self._auth
+                logger.info("refreshing SoundCloud client_id and app_version")
+                client_id = await get_client_id(session)
+                app_version = await get_app_version(session)
+                self._auth = SoundCloudAuth(
+                    app_version=app_version,
+                    client_id=client_id,
+                    oauth=settings.get_soundcloud_oauth()
+                    if settings
+                    else config.settings.soundcloud_oauth,
+                    expires_at=time.monotonic() + config.settings.soundcloud_auth_ttl,
+                )
+            return self._auth
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_key = None
+        self._auth = None
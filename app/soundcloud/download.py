@@ -1,11 +1,21 @@
 
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+import time
+from typing import Callable
+
 from app.core.logging import get_logger
 from app.core import config
+from app.http.bandwidth import BandwidthLimiter
 import asyncio
 import yt_dlp
 
 logger = get_logger(__name__)
 
+# per-download params, they don't decide which YoutubeDL instance is reused
+VOLATILE_PARAMS = {"logger", "progress_hooks"}
+
 
 def sync_download_ytdl(links: list[str], config) -> tuple[bool, Exception | None]:
     with yt_dlp.YoutubeDL(config) as ydl:
@@ -17,6 +27,184 @@ def sync_download_ytdl(links: list[str], config) -> tuple[bool, Exception | None
     return True, None
 
 
+@dataclass
+class YtdlTimings:
+    extract: float = 0.0  # seconds, 0 when cached info was reused
+    transfer: float = 0.0  # seconds, download and post-processing
+    cached_info: bool = False
+
+
+@dataclass
+class YtdlStats:
+    instances: int = 0
+    extractions: int = 0
+    info_cache_hits: int = 0
+    downloads: int = 0
+    failures: int = 0
+    extract_seconds: float = 0.0
+    transfer_seconds: float = 0.0
+
+
+class YtdlSlot:
+    """A long-lived YoutubeDL, progress goes to the hook of the current download"""
+
+    def __init__(self, key: str, params: "yt_dlp._Params") -> None:
+        self.key = key
+        self.hook: Callable[[dict], None] | None = None
+        self.limiter: BandwidthLimiter | None = None
+        self.downloaded_bytes = 0
+        self.ydl = yt_dlp.YoutubeDL(
+            {**params, "progress_hooks": [self.on_progress]}  # type: ignore
+        )
+
+    def on_progress(self, dtl: dict) -> None:
+        if self.hook:
+            self.hook(dtl)
+        downloaded_bytes = dtl.get("downloaded_bytes") or 0
+        if downloaded_bytes < self.downloaded_bytes:
+            # next format or fragment, the counter started over
+            self.downloaded_bytes = 0
+        if self.limiter and dtl.get("status") == "downloading":
+            # blocking yt-dlp's download thread is what slows its reads down
+            self.limiter.throttle(downloaded_bytes - self.downloaded_bytes)
+        self.downloaded_bytes = downloaded_bytes
+
+    def close(self) -> None:
+        self.ydl.close()
+
+
+class YtdlPool:
+    """Reusable YoutubeDL instances plus extracted info shared by retries
+
+    A YoutubeDL keeps its initialised extractors (and the SoundCloud
+    client_id they resolved), so reusing one skips that setup on every
+    track. Instances are not thread safe, a slot serves one download at a
+    time and there are at most as many as concurrent downloads.
+    """
+
+    def __init__(self, info_ttl: int, info_cache_size: int, max_idle: int) -> None:
+        self.info_ttl = info_ttl
+        self.info_cache_size = info_cache_size
+        self.max_idle = max_idle
+        # shared download budget, None downloads at full speed
+        self.limiter: BandwidthLimiter | None = None
+        self.stats = YtdlStats()
+        self._idle: list[YtdlSlot] = []
+        self._info: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def params_key(params: "yt_dlp._Params") -> str:
+        return repr(
+            sorted(
+                (key, value)
+                for key, value in params.items()
+                if key not in VOLATILE_PARAMS
+            )
+        )
+
+    def acquire(self, params: "yt_dlp._Params") -> YtdlSlot:
+        key = self.params_key(params)
+        stale = []
+        with self._lock:
+            # settings changed (proxy, fragments, ...), old instances are useless
+            stale = [slot for slot in self._idle if slot.key != key]
+            self._idle = [slot for slot in self._idle if slot.key == key]
+            slot = self._idle.pop() if self._idle else None
+        for old in stale:
+            old.close()
+        if not slot:
+            slot = YtdlSlot(key, params)
+            self.stats.instances += 1
+        slot.ydl.params["logger"] = params.get("logger")
+        return slot
+
+    def release(self, slot: YtdlSlot) -> None:
+        slot.hook = None
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(slot)
+                return
+        slot.close()
+
+    def get_info(self, url: str) -> dict | None:
+        with self._lock:
+            info, expires_at = self._info.get(url, (None, 0.0))
+            if info and time.time() >= expires_at:
+                # signed media URLs expire, extract again
+                del self._info[url]
+                return None
+            return info
+
+    def set_info(self, url: str, info: dict) -> None:
+        with self._lock:
+            self._info[url] = (info, time.time() + self.info_ttl)
+            self._info.move_to_end(url)
+            while len(self._info) > self.info_cache_size:
+                self._info.popitem(last=False)
+
+    def forget_info(self, url: str) -> None:
+        with self._lock:
+            self._info.pop(url, None)
+
+    def download(
+        self,
+        url: str,
+        params: "yt_dlp._Params",
+        hook: Callable[[dict], None],
+    ) -> tuple[bool, Exception | None, YtdlTimings]:
+        timings = YtdlTimings()
+        slot = self.acquire(params)
+        slot.hook = hook
+        slot.limiter = self.limiter
+        slot.downloaded_bytes = 0
+        try:
+            info = self.get_info(url)
+            timings.cached_info = info is not None
+            if info is None:
+                started = time.perf_counter()
+                info = slot.ydl.extract_info(url, download=False)
+                timings.extract = time.perf_counter() - started
+                self.stats.extractions += 1
+                self.stats.extract_seconds += timings.extract
+                if info:
+                    self.set_info(url, info)
+            else:
+                self.stats.info_cache_hits += 1
+
+            started = time.perf_counter()
+            slot.ydl.process_ie_result(info, download=True)  # type: ignore
+            timings.transfer = time.perf_counter() - started
+            self.stats.transfer_seconds += timings.transfer
+        except Exception as err:
+            logger.error("Error While Downloading %s File Via ydl", url)
+            if timings.cached_info:
+                # the reused media URL may be what failed, next retry extracts
+                self.forget_info(url)
+            self.stats.failures += 1
+            return False, err, timings
+        finally:
+            self.release(slot)
+
+        self.forget_info(url)
+        self.stats.downloads += 1
+        return True, None, timings
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._info.clear()
+        for slot in idle:
+            slot.close()
+
+
+ytdl_pool = YtdlPool(
+    info_ttl=config.settings.ytdl_info_ttl,
+    info_cache_size=config.settings.ytdl_info_cache_size,
+    max_idle=config.settings.concurrent_downloads,
+)
+
+
 async def download_tracks(
     track_urls: list[str],
 ) -> None:
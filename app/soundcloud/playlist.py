@@ -1,23 +1,42 @@
 from fastapi import Request
 from sqlmodel import select
 
+import asyncio
+import aiohttp
+from app.core import config
 from app.core.db import SessionDep
 from app.core.logging import get_logger
 from app.models.playlist import TrackModel
+from app.soundcloud.api import api_get, get_json
 from app.soundcloud.auth import SoundCloudAuth
 from aiohttp import ClientSession
 import re
+from collections.abc import AsyncIterator
 from datetime import datetime
 from app.schemas.playlist import PlaylistSchema, TrackSchema
+from app.schemas.soundcloud import (
+    LibraryPageStruct,
+    PlaylistStruct,
+    PlaylistTracksIdsStruct,
+    TrackLikesPageStruct,
+    TrackStruct,
+    TracksStruct,
+)
 
 logger = get_logger(__name__)
 
+# platform_id -> (upstream revision, playlist), filled by `resolve_playlists`
+playlist_metadata_cache: dict[str, tuple[str, PlaylistSchema]] = {}
 
-async def get_playlists(
-    session: ClientSession, sc_auth: SoundCloudAuth, limit: int = 100
-) -> list[PlaylistSchema]:
-    url = (
-        "https://api-v2.soundcloud.com/me/library/all?"
+
+async def iter_playlists(
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    limit: int = config.settings.library_page_size,
+) -> AsyncIterator[list[PlaylistSchema]]:
+    """Follow `next_href` of the library and yield its playlists page by page"""
+    url: str | None = (
+        f"{config.settings.soundcloud_api_url}/me/library/all?"
         # "offset=2022-01-15T13%3A44%3A17.936Z"
         # "%2Csystem-playlist-like"
         # "%2C00000000000038985529"
@@ -26,117 +45,138 @@ async def get_playlists(
         f"&app_version={sc_auth.app_version}"
         "&app_locale=en"
     )
-    logger.info("Requesting url %s", url)
-    playlists: list[PlaylistSchema] = []
+    # shared across pages, the API can repeat an entry on the next page
     checked = set()
-    async with session.get(url) as req:
-        content = await req.text()
-        logger.info("User playlists api status %d length %d", req.status, len(content))
-        if req.status != 200:
-            logger.error(
-                "Non-200 response from url %s content[2000]: %s", url, content[:2000]
-            )
-            return []
-        data: dict = await req.json()
-        collections: list[dict] = data.get("collection", {})
-
-        for collection in collections:
-            collection: dict
-            playlist: dict = collection.get(
-                "playlist",
+    total = 0
+    while url:
+        logger.info("Requesting url %s", url)
+        data = await get_json(session, url, LibraryPageStruct, sc_auth)
+        if not data:
+            return
+        url = data.next_href
+
+        playlists: list[PlaylistSchema | None] = []
+        fallbacks: dict[int, tuple[str, str | None]] = {}
+        for collection in data.collection:
+            playlist = (
+                collection.playlist
                 # fallback
-                collection.get("system_playlist", {}),
-            )
-            user = playlist.get("user", {}).get("full_name")
-
-            is_system_playlist: bool = "system_playlist" in collection
-            platform_id = str(playlist.get("id", -1))
-            artwork = playlist.get("artwork_url") or playlist.get(
-                "calculated_artwork_url"
+                or collection.system_playlist
+                or PlaylistStruct()
             )
+            is_system_playlist: bool = collection.system_playlist is not None
+            platform_id = str(playlist.id)
+            artwork = playlist.artwork
 
             # prevent duplicated from API
             if platform_id in checked:
                 continue
             checked.add(platform_id)
             if artwork:
-                obj = PlaylistSchema(
-                    platform_id=platform_id,
-                    duration=playlist.get("duration", 0),
-                    is_synced=False,
-                    last_modified=playlist.get("last_modified", datetime.now()),
-                    name=playlist.get("title", "SoundCloud"),
-                    owner=playlist.get("user", {}).get("full_name", None)
-                    or user
-                    or "SoundCloud",
-                    track_count=playlist.get("track_count", 0)
-                    or len(playlist.get("tracks", [])),
-                    url=playlist.get("permalink_url", ""),
-                    thumbnail=artwork,
-                    service="soundcloud",
-                )
-                playlists.append(obj)
+                playlists.append(playlist.to_schema(thumbnail=artwork))
             else:
                 if is_system_playlist:
                     platform_id = platform_id.split(":")[-1]
 
-                obj = await get_playlist(platform_id, session, sc_auth)
-                playlists.append(obj)  # type: ignore
+                revision = playlist.revision
+                cached = playlist_metadata_cache.get(platform_id)
+                if cached and revision and cached[0] == revision:
+                    playlists.append(cached[1])
+                else:
+                    fallbacks[len(playlists)] = (platform_id, revision)
+                    playlists.append(None)
+
+        # playlists without artwork need their own request, resolve them together
+        resolved = await resolve_playlists(fallbacks, session, sc_auth)
+        for index, obj in resolved.items():
+            playlists[index] = obj
+
+        page = [obj for obj in playlists if obj]
+        total += len(page)
+        yield page
+
+    logger.info("Extracted playlists total %d", total)
 
-    logger.info("Extracted playlists total %d", len(playlists))
+
+async def get_playlists(
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    limit: int = config.settings.library_page_size,
+) -> list[PlaylistSchema]:
+    playlists = []
+    async for page in iter_playlists(session, sc_auth, limit):
+        playlists.extend(page)
     return playlists
 
 
+async def resolve_playlists(
+    fallbacks: dict[int, tuple[str, str | None]],
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    concurrency: int = config.settings.playlist_fallback_concurrency,
+) -> dict[int, PlaylistSchema | None]:
+    """Fetch playlist metadata for `{index: (platform_id, revision)}` concurrently
+
+    Results are cached per platform_id until the library reports another
+    revision (`last_modified`) for it.
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def resolve(
+        platform_id: str, revision: str | None
+    ) -> PlaylistSchema | None:
+        async with semaphore:
+            obj = await get_playlist(
+                platform_id, session, sc_auth, representation=None
+            )
+        if obj and revision:
+            playlist_metadata_cache[platform_id] = (revision, obj)
+        return obj
+
+    results = await asyncio.gather(
+        *(resolve(*fallback) for fallback in fallbacks.values())
+    )
+    return dict(zip(fallbacks.keys(), results))
+
+
 async def get_playlist(
-    id: int | str, session: ClientSession, sc_auth: SoundCloudAuth
+    id: int | str,
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    representation: str | None = "full",
 ) -> PlaylistSchema | None:
+    """Fetch one playlist, `representation=None` keeps the default response
+    where only the first tracks are expanded, enough for the metadata"""
     url = (
-        "https://api-v2.soundcloud.com/playlists/"
-        f"{id}"
-        "?representation=full"
-        f"&client_id={sc_auth.client_id}"
+        f"{config.settings.soundcloud_api_url}/playlists/"
+        f"{id}?"
+        + (f"representation={representation}" if representation else "")
+        + f"&client_id={sc_auth.client_id}"
         f"&app_version={sc_auth.app_version}"
         "&app_locale=en"
     )
     logger.info("requesting playlist %s url %s", id, url)
 
-    async with session.get(url) as req:
-        content = await req.text()
-        logger.info("User playlist api status %d length %d", req.status, len(content))
-        if req.status != 200:
-            logger.error(
-                "Non-200 response from url %s content[2000]: %s", url, content[:2000]
-            )
-            return None
-        playlist: dict = await req.json()
-
-        user = playlist.get("user", {}).get("full_name")
-        tracks = playlist.get("tracks", [])
-        first_track_thumbnail = None
-        if tracks:
-            first_track_thumbnail = tracks[0].get("artwork_url")
-
-        obj = PlaylistSchema(
-            platform_id=str(playlist.get("id", -1)),
-            duration=playlist.get("duration", 0),
-            is_synced=False,
-            last_modified=playlist.get("last_modified", datetime.now()),
-            name=playlist.get("title", "SoundCloud"),
-            owner=playlist.get("user", {}).get("full_name", None)
-            or user
-            or "SoundCloud",
-            track_count=playlist.get("track_count", 0) or len(tracks),
-            url=playlist.get("permalink_url", ""),
-            thumbnail=playlist.get("artwork_url") or first_track_thumbnail,
-            service="soundcloud",
-        )
+    playlist = await get_json(session, url, PlaylistStruct, sc_auth)
+    if not playlist:
+        return None
 
-    return obj
+    first_track_thumbnail = None
+    if playlist.tracks:
+        first_track_thumbnail = playlist.tracks[0].artwork_url
+    return playlist.to_schema(
+        thumbnail=playlist.artwork_url or first_track_thumbnail
+    )
 
 async def get_liked_playlist(
-    request: Request, session: ClientSession, sc_auth: SoundCloudAuth, limit: int = 1000
+    request: Request,
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    limit: int = config.settings.liked_tracks_page_size,
 ) -> PlaylistSchema:
-    tracks = await get_liked_tracks(session, sc_auth, limit)
+    track_count = 0
+    async for page in iter_liked_tracks(session, sc_auth, limit):
+        track_count += len(page)
     obj = PlaylistSchema(
         platform_id="soundcloud-likes",
         duration=0,
@@ -144,7 +184,7 @@ async def get_liked_playlist(
         last_modified=datetime.now(),
         name="SoundCloud Likes",
         owner="SoundCloud",
-        track_count=len(tracks),
+        track_count=track_count,
         url="soundcloud-likes",
         thumbnail=str(request.url_for("static", path="/liked.png")),
         service="soundcloud",
@@ -175,11 +215,14 @@ async def get_unassigned_tracks_playlist(
     logger.info("The Liked Playlist Schema %s", obj)
     return obj
 
-async def get_liked_tracks(
-    session: ClientSession, sc_auth: SoundCloudAuth, limit: int = 1000
-) -> list[TrackSchema]:
-    url = (
-        f"https://api-v2.soundcloud.com/users/{sc_auth.user_id}/track_likes?"
+async def iter_liked_tracks(
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    limit: int = config.settings.liked_tracks_page_size,
+) -> AsyncIterator[list[TrackSchema]]:
+    """Follow `next_href` and yield the liked tracks one page at a time"""
+    url: str | None = (
+        f"{config.settings.soundcloud_api_url}/users/{sc_auth.user_id}/track_likes?"
         # "offset=2025-07-11T12%3A59%3A13.428Z%2Cuser-track-likes%2C000-00000000000751401199-00000000002038114156"
         f"&limit={limit}"
         f"&client_id={sc_auth.client_id}"
@@ -187,58 +230,87 @@ async def get_liked_tracks(
         "&app_locale=en"
     )
     logger.info("Requesting url %s ", url)
-    liked_tracks: list[dict] = []
+    total = 0
     while url:
-        async with session.get(url) as req:
-            content = await req.text()
-            logger.info(
-                "track likes Api response status %d length %d", req.status, len(content)
-            )
+        data = await get_json(session, url, TrackLikesPageStruct, sc_auth)
+        if not data:
+            return
+        url = data.next_href
 
-            if req.status != 200:
-                logger.error(
-                    "Non-200 Response status %d content[2000]: %s",
-                    req.status,
-                    content[:2000],
-                )
-                return []
+        objects = [
+            (item.track or TrackStruct()).to_schema() for item in data.collection
+        ]
+        del data
+        total += len(objects)
+        yield objects
 
-            data: dict = await req.json()
-            tracks: list[dict] = data.get("collection", [])
-            url: str | None = data.get("next_href")
+        if url:
+            logger.info("Paginate to next page %s", url)
 
-            liked_tracks.extend(tracks)
+    logger.info("Extracted liked tracks total %d", total)
 
-            if url:
-                logger.info("Paginate to next page %s", url)
 
+async def get_liked_tracks(
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    limit: int = config.settings.liked_tracks_page_size,
+) -> list[TrackSchema]:
     objects = []
-    for data in liked_tracks:
-        track = data.get("track", {})
-        obj = TrackSchema(
-            platform_id=str(track.get("id", 0)),
-            url=track.get("permalink_url"),
-            name=track.get("title", "SoundCloud"),
-            artist_name=track.get("user", {}).get("full_name"),
-            album=None,
-            duration=track.get("duration", 0),
-            is_synced=False,
-            thumbnail=track.get("artwork_url"),
-        )
-        objects.append(obj)
-    logger.info("Extracted liked tracks total %d", len(objects))
-
+    async for page in iter_liked_tracks(session, sc_auth, limit):
+        objects.extend(page)
     return objects
 
 
+def get_secret_token(playlist_uri: str) -> str | None:
+    """`https://soundcloud.com/user/sets/name/s-AbC` -> `s-AbC`"""
+    last_segment = playlist_uri.rstrip("/").rsplit("/", 1)[-1]
+    if last_segment.startswith("s-"):
+        return last_segment
+    return None
+
+
 async def get_playlist_tracks_ids(
+    playlist_id: str,
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    playlist_uri: str = "",
+) -> list[str]:
+    """Track IDs of a playlist in playlist order, without duplicates
+
+    Read from the track stubs of the api-v2 playlist, which also covers
+    private and secret playlists. Scraping the playlist page is only the
+    fallback when the API can't resolve it (e.g. system playlists).
+    """
+    secret_token = get_secret_token(playlist_uri)
+    url = (
+        f"{config.settings.soundcloud_api_url}/playlists/{playlist_id}?"
+        + (f"secret_token={secret_token}" if secret_token else "")
+        + f"&client_id={sc_auth.client_id}"
+        f"&app_version={sc_auth.app_version}"
+        "&app_locale=en"
+    )
+    logger.info("requesting playlist track stubs %s", url)
+    playlist = await get_json(session, url, PlaylistTracksIdsStruct, sc_auth)
+    if playlist is None:
+        if not playlist_uri:
+            return []
+        logger.warning("fallback to playlist page for %s", playlist_uri)
+        return await get_playlist_page_tracks_ids(playlist_uri, session)
+
+    tracks_ids = list(dict.fromkeys(str(track.id) for track in playlist.tracks))
+    logger.info("extracted playlist tracks IDs total %d", len(tracks_ids))
+    logger.debug("extracted track ids : %s", tracks_ids)
+    return tracks_ids
+
+
+async def get_playlist_page_tracks_ids(
     playlist_uri: str,
     session: ClientSession,
 ) -> list[str]:
     logger.info("request playlist page %s", playlist_uri)
     track_ids_regex = r'"id"\s*:\s*(\d+)\s*,\s*"kind"\s*:\s*"track"'
 
-    async with session.get(playlist_uri) as req:
+    async with api_get(session, playlist_uri, endpoint="playlist-page") as req:
         content = await req.text()
         logger.info(
             "playlist page response status %d length %d", req.status, len(content)
@@ -250,65 +322,95 @@ async def get_playlist_tracks_ids(
                 content[:2000],
             )
             return []
-        tracks_ids: list[str] = re.findall(track_ids_regex, content)
+        tracks_ids: list[str] = list(
+            dict.fromkeys(re.findall(track_ids_regex, content))
+        )
         logger.info("extracted playlist tracks IDs total %d", len(tracks_ids))
         logger.debug("extracted track ids : %s", tracks_ids)
     return tracks_ids
 
 
+async def get_tracks_batch(
+    tracks_ids: list[str],
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    retries: int = config.settings.tracks_batch_retries,
+) -> list[TrackStruct] | None:
+    """Hydrate one batch of track IDs, returns None when all attempts failed"""
+    url = (
+        f"{config.settings.soundcloud_api_url}/tracks?"
+        f"ids={'%2C'.join(tracks_ids)}"
+        f"&client_id={sc_auth.client_id}"
+        f"&app_version={sc_auth.app_version}"
+        "&app_locale=en"
+    )
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            logger.info("retry tracks batch %d/%d", attempt, retries)
+        logger.info("requesting tracks api via url %s ", url)
+        try:
+            tracks = await get_json(session, url, TracksStruct, sc_auth)
+            if tracks:
+                return tracks.root
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            logger.error("error on tracks api request %s", err)
+    return None
+
+
 async def get_playlist_tracks(
-    playlist_uri: str,
+    playlist_id: str,
     session: ClientSession,
     sc_auth: SoundCloudAuth,
-    batch_size_tracks_ids: int = 29,
+    playlist_uri: str = "",
+    batch_size_tracks_ids: int = config.settings.tracks_batch_size,
+    concurrency: int = config.settings.tracks_batch_concurrency,
 ) -> list[TrackSchema]:
+    tracks_ids = await get_playlist_tracks_ids(
+        playlist_id, session, sc_auth, playlist_uri
+    )
+    return await get_tracks(
+        tracks_ids, session, sc_auth, batch_size_tracks_ids, concurrency
+    )
 
-    tracks_ids = await get_playlist_tracks_ids(playlist_uri, session)
-    id_query_batch = []
-    tracks_data: list[dict] = []
-
-    for i in range(0, len(tracks_ids), batch_size_tracks_ids):
-        ids_query = "%2C".join(tracks_ids[i : i + batch_size_tracks_ids])
-        id_query_batch.append(ids_query)
-
-    for ids_query in id_query_batch:
-        url = (
-            "https://api-v2.soundcloud.com/tracks?"
-            f"ids={ids_query}"
-            f"&client_id={sc_auth.client_id}"
-            f"&app_version={sc_auth.app_version}"
-            "&app_locale=en"
-        )
-        logger.info("requesting tracks api via url %s ", url)
-        async with session.get(url) as req:
-            content = await req.text()
-            logger.info(
-                "tracks api response status %d length %d", req.status, len(content)
-            )
-            if req.status != 200:
-                logger.error(
-                    "error on tracks api with status %d content[2000] %s",
-                    req.status,
-                    content[:2000],
-                )
-                return []
 
-            tracks_data.extend(await req.json())
+async def get_tracks(
+    tracks_ids: list[str],
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+    batch_size_tracks_ids: int = config.settings.tracks_batch_size,
+    concurrency: int = config.settings.tracks_batch_concurrency,
+) -> list[TrackSchema]:
+    """Hydrate track IDs via `/tracks?ids=`, keeps the order of `tracks_ids`"""
+    id_batches = [
+        tracks_ids[i : i + batch_size_tracks_ids]
+        for i in range(0, len(tracks_ids), batch_size_tracks_ids)
+    ]
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def fetch(batch: list[str]) -> list[TrackStruct] | None:
+        async with semaphore:
+            return await get_tracks_batch(batch, session, sc_auth)
+
+    # gather keeps batch order, ids inside a batch are re-ordered below
+    results = await asyncio.gather(*(fetch(batch) for batch in id_batches))
 
     objects = []
-    for data in tracks_data:
-        obj = TrackSchema(
-            platform_id=str(data.get("id", 0)),
-            url=data.get("permalink_url"),
-            name=data.get("title", "SoundCloud"),
-            artist_name=data.get("user", {}).get("full_name"),
-            album=None,
-            duration=data.get("duration", 0),
-            is_synced=False,
-            thumbnail=data.get("artwork_url"),
+    failed_batches = 0
+    for batch, tracks_data in zip(id_batches, results):
+        if tracks_data is None:
+            failed_batches += 1
+            continue
+        lookup = {str(track.id): track for track in tracks_data}
+        for track_id in batch:
+            track = lookup.get(track_id)
+            if track:
+                objects.append(track.to_schema())
+
+    if failed_batches:
+        logger.error(
+            "tracks api failed for %d/%d batches", failed_batches, len(id_batches)
         )
-        objects.append(obj)
+    logger.info("extracted tracks data total %d", len(objects))
 
-    logger.info("extracted tracks data total %d", len(tracks_data))
-
-    return objects
\ No newline at end of file
+    return objects
@@ -0,0 +1,98 @@
+from urllib.parse import urljoin
+
+from aiohttp import ClientSession
+
+from app.core import config
+from app.core.logging import get_logger
+from app.schemas.soundcloud import (
+    StreamUrlStruct,
+    TrackStreamStruct,
+    TranscodingStruct,
+)
+from app.soundcloud.api import get_json
+from app.soundcloud.auth import SoundCloudAuth
+
+logger = get_logger(__name__)
+
+EXTENSIONS = {
+    "audio/mpeg": "mp3",
+    "audio/mp4": "m4a",
+    "audio/ogg": "opus",
+}
+# HLS segments are joined by concatenation, only mp3 survives that as is
+HLS_MIME_TYPES = {"audio/mpeg"}
+
+
+class UnsupportedStreamError(Exception):
+    """No transcoding the native downloader can fetch, use yt-dlp"""
+
+
+def pick_transcoding(transcodings: list[TranscodingStruct]) -> TranscodingStruct:
+    """Full-length transcoding in preference order: progressive, mp3 HLS"""
+    candidates = [
+        transcoding
+        for transcoding in transcodings
+        if not transcoding.snipped
+        and transcoding.format.mime_type.split(";")[0] in EXTENSIONS
+    ]
+    progressive = [
+        transcoding
+        for transcoding in candidates
+        if transcoding.format.protocol == "progressive"
+    ]
+    hls = [
+        transcoding
+        for transcoding in candidates
+        if transcoding.format.protocol == "hls"
+        and transcoding.format.mime_type.split(";")[0] in HLS_MIME_TYPES
+    ]
+    for choices in (progressive, hls):
+        if choices:
+            return choices[0]
+    raise UnsupportedStreamError(
+        "no supported transcoding in "
+        f"{[(t.format.protocol, t.format.mime_type) for t in transcodings]}"
+    )
+
+
+async def get_track_stream(
+    track_id: str,
+    session: ClientSession,
+    sc_auth: SoundCloudAuth,
+) -> tuple[TrackStreamStruct, TranscodingStruct, str]:
+    """Track metadata, chosen transcoding and its signed media URL"""
+    track = await get_json(
+        session,
+        f"{config.settings.soundcloud_api_url}/tracks/{track_id}?"
+        f"client_id={sc_auth.client_id}"
+        f"&app_version={sc_auth.app_version}",
+        TrackStreamStruct,
+        sc_auth,
+    )
+    if not track:
+        raise UnsupportedStreamError(f"track {track_id} metadata is not available")
+
+    transcoding = pick_transcoding(track.media.transcodings)
+    separator = "&" if "?" in transcoding.url else "?"
+    url = f"{transcoding.url}{separator}client_id={sc_auth.client_id}"
+    if track.track_authorization:
+        url += f"&track_authorization={track.track_authorization}"
+    stream = await get_json(session, url, StreamUrlStruct, sc_auth)
+    if not stream:
+        raise UnsupportedStreamError(f"track {track_id} stream url is not available")
+    return track, transcoding, stream.url
+
+
+def parse_hls_playlist(playlist_url: str, content: str) -> list[str]:
+    """Absolute segment URLs of a media playlist, in order"""
+    segments = []
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-KEY") and "METHOD=NONE" not in line:
+            raise UnsupportedStreamError("encrypted HLS stream")
+        if not line or line.startswith("#"):
+            continue
+        segments.append(urljoin(playlist_url, line))
+    if not segments:
+        raise UnsupportedStreamError("HLS playlist without segments")
+    return segments
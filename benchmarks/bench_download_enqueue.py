@@ -0,0 +1,141 @@
+"""Memory and CPU cost of a huge download queue
+
+The old path is the previous `DownloadManager`: every enqueued item carries
+a pre-built `download(ctx)` coroutine and the worker turns each one into a
+task waiting on a `Condition` semaphore. The new path keeps light
+`QueueItem` records and builds a task only when a slot is free. Downloads
+are fake (a short sleep), usage:
+
+    python -m benchmarks.bench_download_enqueue --items 50000 --complete 200
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+from asyncio import Condition, Queue
+
+from app.download_manager.manager import DownloadContext, DownloadManager
+from app.download_manager.progress import ProgressStore
+from app.download_manager.scheduler import PRIORITY_PLAYLIST
+
+
+class OldSemaphore:
+    def __init__(self, total_limit: int) -> None:
+        self.total_limit = total_limit
+        self.total_tasks = 0
+        self._condition = Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            while self.total_tasks >= self.total_limit:
+                await self._condition.wait()
+            self.total_tasks += 1
+
+    async def release(self):
+        async with self._condition:
+            self.total_tasks -= 1
+            self._condition.notify_all()
+
+
+class OldManager:
+    def __init__(self, total_concurrent_downloads: int) -> None:
+        self.semaphore = OldSemaphore(total_concurrent_downloads)
+        self.queue = Queue()
+        self.tasks = {}
+        self.progress = ProgressStore()
+
+    async def worker(self):
+        while True:
+            download_id, download_task, cancel_event, _ = await self.queue.get()
+            task = asyncio.create_task(self.task_runner(download_task))
+            self.tasks[download_id] = (task, cancel_event)
+
+    async def task_runner(self, task):
+        await self.semaphore.acquire()
+        try:
+            await task
+        finally:
+            await self.semaphore.release()
+
+    async def add_to_queue(self, download_id, download_task, cancel_event, priority):
+        await self.queue.put((download_id, download_task, cancel_event, priority))
+
+
+def fake_download(latency: float, done: list):
+    async def download(ctx: DownloadContext):
+        await asyncio.sleep(latency)
+        done.append(ctx.download_track_id)
+
+    return download
+
+
+async def old_path(items: int, runner) -> tuple[OldManager, asyncio.Task]:
+    manager = OldManager(4)
+    for download_id in range(items):
+        ctx = DownloadContext(
+            progress=manager.progress,
+            cancel_event=threading.Event(),
+            download_track_id=download_id,
+        )
+        await manager.add_to_queue(download_id, runner(ctx), ctx.cancel_event, -1)
+    worker = asyncio.create_task(manager.worker())
+    # the worker turns everything queued into waiting tasks right away
+    while manager.queue.qsize():
+        await asyncio.sleep(0)
+    return manager, worker
+
+
+async def new_path(items: int, runner) -> tuple[DownloadManager, asyncio.Task]:
+    manager = DownloadManager(4, runner)
+    for download_id in range(items):
+        await manager.add_to_queue(download_id, PRIORITY_PLAYLIST, 1)
+    worker = asyncio.create_task(manager.worker())
+    await asyncio.sleep(0)
+    return manager, worker
+
+
+async def measure(build, items: int, complete: int, latency: float) -> tuple:
+    done: list[int] = []
+    tracemalloc.start()
+    started = time.process_time()
+    manager, worker = await build(items, fake_download(latency, done))
+    enqueue_cpu = time.process_time() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    live_tasks = len(asyncio.all_tasks())
+
+    started = time.process_time()
+    while len(done) < complete:
+        await asyncio.sleep(latency / 4)
+    drain_cpu = time.process_time() - started
+
+    worker.cancel()
+    tasks = [task for task, _ in manager.tasks.values()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(worker, *tasks, return_exceptions=True)
+    return enqueue_cpu, peak, live_tasks, drain_cpu
+
+
+async def main(items: int, complete: int, latency: float) -> None:
+    print(f"items={items}, cpu to finish {complete} downloads of {latency}s each")
+    print(f"{'path':>5} {'enqueue s':>10} {'peak MiB':>9} {'tasks':>7} {'drain s':>8}")
+    for name, build in (("old", old_path), ("new", new_path)):
+        enqueue_cpu, peak, live_tasks, drain_cpu = await measure(
+            build, items, complete, latency
+        )
+        print(
+            f"{name:>5} {enqueue_cpu:>10.3f} {peak / 1024 / 1024:>9.1f} "
+            f"{live_tasks:>7} {drain_cpu:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--complete", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.complete, args.latency))
@@ -0,0 +1,156 @@
+"""Decode cost of a `representation=full` playlist payload
+
+Compares the old path (`req.text()` + `req.json()` then `.get()` chains)
+with `get_json` (one bytes read, one typed parse). Pass a recorded
+payload with `--payload`, otherwise a synthetic one shaped like api-v2 is
+generated, usage:
+
+    python -m benchmarks.bench_json_decode --tracks 2000
+    python -m benchmarks.bench_json_decode --payload playlist.json
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.schemas.playlist import PlaylistSchema, TrackSchema
+from app.schemas.soundcloud import PlaylistStruct
+
+
+def synthetic_track(i: int) -> dict:
+    return {
+        "id": 1_000_000 + i,
+        "kind": "track",
+        "title": f"Track number {i} (Original Mix)",
+        "permalink_url": f"https://soundcloud.com/artist-{i % 50}/track-{i}",
+        "artwork_url": f"https://i1.sndcdn.com/artworks-{i:012d}-large.jpg",
+        "duration": 180_000 + i,
+        "full_duration": 180_000 + i,
+        "created_at": "2024-01-01T00:00:00Z",
+        "last_modified": "2024-06-01T00:00:00Z",
+        "description": "lorem ipsum dolor sit amet " * 20,
+        "genre": "Electronic",
+        "tag_list": "house techno deep",
+        "waveform_url": f"https://wave.sndcdn.com/{i:012d}_m.json",
+        "playback_count": i * 7,
+        "likes_count": i * 3,
+        "publisher_metadata": {"id": i, "artist": f"artist {i}", "isrc": "X" * 12},
+        "media": {
+            "transcodings": [
+                {
+                    "url": f"https://api-v2.soundcloud.com/media/{i}/{kind}",
+                    "preset": preset,
+                    "duration": 180_000 + i,
+                    "snipped": False,
+                    "format": {"protocol": kind, "mime_type": "audio/mpeg"},
+                    "quality": "sq",
+                }
+                for kind, preset in (("hls", "mp3_0_0"), ("progressive", "mp3_0_0"))
+            ]
+        },
+        "user": {
+            "id": i % 50,
+            "username": f"artist-{i % 50}",
+            "full_name": f"Artist {i % 50}",
+            "avatar_url": f"https://i1.sndcdn.com/avatars-{i % 50}-large.jpg",
+            "followers_count": 1000,
+            "permalink_url": f"https://soundcloud.com/artist-{i % 50}",
+        },
+    }
+
+
+def synthetic_payload(total_tracks: int) -> bytes:
+    tracks = [synthetic_track(i) for i in range(total_tracks)]
+    playlist = {
+        "id": 42,
+        "title": "Benchmark playlist",
+        "permalink_url": "https://soundcloud.com/me/sets/benchmark",
+        "artwork_url": None,
+        "last_modified": "2024-06-01T00:00:00Z",
+        "track_count": total_tracks,
+        "duration": sum(track["duration"] for track in tracks),
+        "user": {"full_name": "Me"},
+        "tracks": tracks,
+    }
+    return json.dumps(playlist).encode()
+
+
+def old_path(body: bytes) -> tuple[PlaylistSchema, list[TrackSchema]]:
+    # aiohttp decodes the body for `text()` and again for `json()`
+    content = body.decode()
+    playlist: dict = json.loads(body.decode())
+    assert len(content)
+    tracks = playlist.get("tracks", [])
+    obj = PlaylistSchema(
+        platform_id=str(playlist.get("id", -1)),
+        duration=playlist.get("duration", 0),
+        is_synced=False,
+        last_modified=playlist.get("last_modified", datetime.now()),
+        name=playlist.get("title", "SoundCloud"),
+        owner=playlist.get("user", {}).get("full_name", None) or "SoundCloud",
+        track_count=playlist.get("track_count", 0) or len(tracks),
+        url=playlist.get("permalink_url", ""),
+        thumbnail=playlist.get("artwork_url"),
+        service="soundcloud",
+    )
+    objects = [
+        TrackSchema(
+            platform_id=str(data.get("id", 0)),
+            url=data.get("permalink_url"),
+            name=data.get("title", "SoundCloud"),
+            artist_name=data.get("user", {}).get("full_name"),
+            album=None,
+            duration=data.get("duration", 0),
+            is_synced=False,
+            thumbnail=data.get("artwork_url"),
+        )
+        for data in tracks
+    ]
+    return obj, objects
+
+
+def new_path(body: bytes) -> tuple[PlaylistSchema, list[TrackSchema]]:
+    playlist = PlaylistStruct.model_validate_json(body)
+    return (
+        playlist.to_schema(thumbnail=playlist.artwork_url),
+        [track.to_schema() for track in playlist.tracks],
+    )
+
+
+def measure(fn, body: bytes, rounds: int) -> tuple[float, int]:
+    fn(body)  # warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(body)
+    elapsed = (time.perf_counter() - started) / rounds
+
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(body: bytes, rounds: int) -> None:
+    assert old_path(body) == new_path(body)
+    print(f"payload {len(body) / 1024 / 1024:.2f} MiB, {rounds} rounds")
+    print(f"{'path':>6} {'ms/decode':>10} {'peak MiB':>9}")
+    for name, fn in (("old", old_path), ("new", new_path)):
+        elapsed, peak = measure(fn, body, rounds)
+        print(f"{name:>6} {elapsed * 1000:>10.2f} {peak / 1024 / 1024:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payload", help="recorded playlist json file")
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    if args.payload:
+        with open(args.payload, "rb") as file:
+            body = file.read()
+    else:
+        body = synthetic_payload(args.tracks)
+    main(body, args.rounds)
@@ -0,0 +1,203 @@
+"""Native aiohttp downloader vs the yt-dlp thread path
+
+Runs a local fake api-v2 plus media CDN. Every media request waits
+`--latency` before answering, HLS tracks are split into `--segments`
+segments. yt-dlp can't run its SoundCloud extractor against the fake, so
+its path downloads the same progressive file through the generic
+extractor, usage:
+
+    python -m benchmarks.bench_native_download --tracks 32 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+from app.core import config
+from app.download_manager.manager import DownloadContext
+from app.download_manager.native_downloader import native_downloader
+from app.download_manager.progress import ProgressStore
+from app.models.playlist import TrackModel
+from app.soundcloud import api
+from app.soundcloud.auth import SoundCloudAuth
+from app.soundcloud.client import SoundCloudClient
+from app.soundcloud.download import ytdl_pool
+
+
+class BenchClient(SoundCloudClient):
+    async def get_auth(self, settings):
+        return SoundCloudAuth(app_version="1", client_id="bench", expires_at=1e12)
+
+
+def fake_server(size: int, segments: int, latency: float, state: dict):
+    body = os.urandom(size)
+    segment_size = -(-size // segments)
+
+    async def track(request: web.Request) -> web.Response:
+        track_id = request.match_info["id"]
+        base = f"{request.scheme}://{request.host}"
+        transcodings = [
+            {
+                "url": f"{base}/media/{track_id}/{protocol}",
+                "format": {"protocol": protocol, "mime_type": "audio/mpeg"},
+            }
+            for protocol in state["protocols"]
+        ]
+        return web.json_response(
+            {
+                "id": int(track_id),
+                "title": f"track {track_id}",
+                "media": {"transcodings": transcodings},
+                "track_authorization": "token",
+            }
+        )
+
+    async def stream_url(request: web.Request) -> web.Response:
+        track_id = request.match_info["id"]
+        base = f"{request.scheme}://{request.host}"
+        if request.match_info["protocol"] == "hls":
+            return web.json_response({"url": f"{base}/hls/{track_id}.m3u8"})
+        return web.json_response({"url": f"{base}/files/{track_id}.mp3"})
+
+    async def playlist(request: web.Request) -> web.Response:
+        track_id = request.match_info["id"]
+        lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:10"]
+        for i in range(segments):
+            lines += ["#EXTINF:10.0,", f"/segments/{track_id}/{i}.mp3"]
+        lines.append("#EXT-X-ENDLIST")
+        return web.Response(text="\n".join(lines))
+
+    async def segment(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        i = int(request.match_info["n"])
+        return web.Response(body=body[i * segment_size : (i + 1) * segment_size])
+
+    async def file(request: web.Request) -> web.StreamResponse:
+        await asyncio.sleep(latency)
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        response.content_length = len(body)
+        await response.prepare(request)
+        try:
+            for offset in range(0, len(body), 256 * 1024):
+                await response.write(body[offset : offset + 256 * 1024])
+        except ConnectionError:
+            pass  # the generic extractor drops its probe request mid-body
+        return response
+
+    app = web.Application()
+    app.router.add_get("/tracks/{id}", track)
+    app.router.add_get("/media/{id}/{protocol}", stream_url)
+    app.router.add_get("/hls/{id}.m3u8", playlist)
+    app.router.add_get("/segments/{id}/{n}.mp3", segment)
+    app.router.add_get("/files/{id}.mp3", file)
+    return app
+
+
+def context(download_id: int) -> DownloadContext:
+    return DownloadContext(
+        progress=ProgressStore(),
+        cancel_event=threading.Event(),
+        download_track_id=download_id,
+    )
+
+
+def fake_track(i: int) -> TrackModel:
+    return TrackModel(
+        id=i,
+        platform_id=str(i),
+        url=None,
+        name=f"track {i}",
+        artist_name=None,
+        album=None,
+        duration=0,
+        is_synced=False,
+        thumbnail=None,
+    )
+
+
+async def run_native(tracks: int, concurrency: int, sc_client) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await native_downloader.download(context(i), fake_track(i), sc_client, None)
+
+    await asyncio.gather(*(one(i) for i in range(tracks)))
+
+
+async def run_ytdlp(tracks: int, concurrency: int, base_url: str) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    params = dict(config.ydl_opts, quiet=True, noprogress=True, proxy=None)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            ok, err, _ = await asyncio.to_thread(
+                ytdl_pool.download,
+                f"{base_url}/files/{i}.mp3",
+                params,
+                lambda dtl: None,
+            )
+            assert ok, err
+
+    await asyncio.gather(*(one(i) for i in range(tracks)))
+
+
+async def main(args: argparse.Namespace) -> None:
+    state = {"protocols": ["progressive"]}
+    runner = web.AppRunner(fake_server(args.size, args.segments, args.latency, state))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    base_url = f"http://127.0.0.1:{port}"
+    config.settings.soundcloud_api_url = base_url
+    # measure the downloaders, not the shared SoundCloud rate limit
+    api.rate_limiter.max_rate = api.rate_limiter.rate = 10_000
+    api.rate_limiter.burst = 10_000
+    config.settings.concurrent_fragment_downloads = args.segment_concurrency
+    ytdl_pool.max_idle = args.concurrency
+    # every path writes straight into the folder that's checked below
+    config.settings.storage_layout = "flat"
+    sc_client = BenchClient()
+
+    print(
+        f"tracks={args.tracks} size={args.size / 1024 / 1024:.1f} MiB "
+        f"latency={args.latency * 1000:.0f}ms concurrency={args.concurrency}"
+    )
+    print(f"{'path':>18} {'wall s':>8} {'cpu s':>8} {'MiB/s':>8}")
+    for name in ("ytdlp", "native progressive", "native hls"):
+        config.settings.download_folder = folder = tempfile.mkdtemp()
+        config.ydl_opts["outtmpl"] = config.settings.output_download
+        state["protocols"] = ["hls"] if name == "native hls" else ["progressive"]
+        started, cpu_started = time.perf_counter(), time.process_time()
+        if name == "ytdlp":
+            await run_ytdlp(args.tracks, args.concurrency, base_url)
+        else:
+            await run_native(args.tracks, args.concurrency, sc_client)
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        throughput = args.tracks * args.size / 1024 / 1024 / wall
+        sizes = [entry.stat().st_size for entry in os.scandir(folder)]
+        assert sizes == [args.size] * args.tracks, sizes
+        print(f"{name:>18} {wall:>8.2f} {cpu:>8.2f} {throughput:>8.1f}")
+
+    await native_downloader.close()
+    await sc_client.close()
+    ytdl_pool.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=32)
+    parser.add_argument("--size", type=int, default=4_000_000, help="bytes per track")
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--segment-concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
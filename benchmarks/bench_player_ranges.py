@@ -0,0 +1,147 @@
+"""Player range serving: old `file_streamer` generator vs `FileRangeResponse`
+
+A uvicorn server in its own process serves one file both ways. Every
+client seeks like an audio player, it requests `--range-size` bytes at
+random offsets, `--seeks` times. Server CPU is read from the server
+process, MB/s counts the requested bytes and "received" how many bytes
+came back per byte asked for. uvicorn has no zero-copy send, so "new" is
+the `os.pread` path the app runs in production, usage:
+
+    python -m benchmarks.bench_player_ranges --clients 64 --seeks 20
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+from app.http.ranges import FileRangeResponse, parse_range_header
+
+PORT = 8977
+
+
+def old_file_streamer(file_path: Path, start: int, end: int, chunk_size: int):
+    total_size = end - start
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        while total_size >= 0:
+            total_size -= min(chunk_size, chunk_size)
+            chunk = file.read(min(chunk_size, chunk_size))
+            yield chunk
+
+
+def serve(path: str, chunk_size: int) -> None:
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    file_path = Path(path)
+    file_size = file_path.stat().st_size
+
+    @app.get("/old")
+    async def old(request: Request):
+        range_header = request.headers.get("range", "").lstrip("bytes=")
+        start_range, end_range = range_header.split("-")
+        start_range, end_range = int(start_range), int(end_range)
+        return StreamingResponse(
+            status_code=206,
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Type": "audio/mpeg",
+                "Content-Range": f"bytes {start_range}-{end_range}/{file_size}",
+            },
+            content=old_file_streamer(file_path, start_range, end_range, chunk_size),
+        )
+
+    @app.get("/new")
+    async def new(request: Request):
+        ranges = parse_range_header(request.headers["range"], file_size)
+        return FileRangeResponse(file_path, file_size, "audio/mpeg", ranges, chunk_size)
+
+    @app.get("/cpu")
+    async def cpu():
+        return time.process_time()
+
+    uvicorn.run(app, port=PORT, log_level="warning")
+
+
+async def client(
+    session: aiohttp.ClientSession, url: str, file_size: int, args, counts: dict
+) -> None:
+    for _ in range(args.seeks):
+        start = random.randrange(0, file_size - args.range_size)
+        end = start + args.range_size - 1
+        async with session.get(url, headers={"Range": f"bytes={start}-{end}"}) as r:
+            body = await r.read()
+        counts["requested"] += args.range_size
+        counts["received"] += len(body)
+
+
+async def run(name: str, file_size: int, args) -> None:
+    base = f"http://127.0.0.1:{PORT}"
+    counts = {"requested": 0, "received": 0}
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{base}/cpu") as r:
+            cpu_started = await r.json()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                client(session, f"{base}/{name}", file_size, args, counts)
+                for _ in range(args.clients)
+            )
+        )
+        wall = time.perf_counter() - started
+        async with session.get(f"{base}/cpu") as r:
+            cpu = await r.json() - cpu_started
+    requests = args.clients * args.seeks
+    print(
+        f"{name:>6} {wall:8.2f} {cpu:8.2f} {requests / wall:9.0f}"
+        f" {counts['requested'] / wall / 2**20:9.1f}"
+        f" {counts['received'] / counts['requested']:9.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seeks", type=int, default=20)
+    parser.add_argument("--range-size", type=int, default=256 * 1024)
+    parser.add_argument("--file-size", type=int, default=64 * 2**20)
+    parser.add_argument("--chunk-size", type=int, default=2**20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "track.mp3")
+        with open(path, "wb") as file:
+            file.write(os.urandom(args.file_size))
+        server = multiprocessing.get_context("spawn").Process(
+            target=serve, args=(path, args.chunk_size), daemon=True
+        )
+        server.start()
+        time.sleep(2)
+        try:
+            print(
+                f"clients={args.clients} seeks={args.seeks}"
+                f" range={args.range_size} chunk={args.chunk_size}"
+            )
+            print(
+                f"{'path':>6} {'wall s':>8} {'cpu s':>8} {'req/s':>9}"
+                f" {'MB/s':>9} {'received':>9}"
+            )
+            for name in ("old", "new"):
+                asyncio.run(run(name, args.file_size, args))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Event loop lag while yt-dlp downloads run in threads vs worker processes
+
+A separate `http.server` process serves the media files, a ticker measures
+how late `asyncio.sleep` wakes up while the downloads run, usage:
+
+    python -m benchmarks.bench_process_pool --tracks 32 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.core import config
+from app.download_manager.process_pool import DownloadProcessPool
+from app.soundcloud.download import ytdl_pool
+
+TICK = 0.005
+
+
+async def ticker(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(
+    name: str, args: argparse.Namespace, base_url: str, pool: DownloadProcessPool
+) -> None:
+    folder = tempfile.mkdtemp()
+    params = dict(
+        config.ydl_opts,
+        outtmpl=f"{folder}/%(title)s.%(ext)s",
+        quiet=True,
+        noprogress=True,
+        proxy=None,
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    hooks = 0
+
+    def hook(dtl: dict) -> None:
+        nonlocal hooks
+        hooks += 1
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            url = f"{base_url}/{i}.mp3"
+            if name == "processes":
+                ok, err, _ = await pool.download(i, url, params, hook)
+            else:
+                ok, err, _ = await asyncio.to_thread(
+                    ytdl_pool.download, url, params, hook
+                )
+            assert ok, err
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.tracks)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    sizes = [entry.stat().st_size for entry in os.scandir(folder)]
+    assert sizes == [args.size] * args.tracks, sizes
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99)]
+    print(
+        f"{name:>10} {wall:>8.2f} {statistics.median(lags_ms):>8.2f} "
+        f"{p99:>8.2f} {lags_ms[-1]:>8.2f} {hooks:>8}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    media = tempfile.mkdtemp()
+    for i in range(args.tracks):
+        with open(os.path.join(media, f"{i}.mp3"), "wb") as file:
+            file.write(os.urandom(args.size))
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "http.server", str(port), "-b", "127.0.0.1"],
+        cwd=media,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    await asyncio.sleep(1)
+    base_url = f"http://127.0.0.1:{port}"
+
+    ytdl_pool.max_idle = args.concurrency
+    pool = DownloadProcessPool(args.concurrency)
+    pool.start()
+    print(
+        f"tracks={args.tracks} size={args.size / 1024 / 1024:.1f} MiB "
+        f"concurrency={args.concurrency}"
+    )
+    print(
+        f"{'path':>10} {'wall s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'hooks':>8}"
+    )
+    try:
+        for name in ("threads", "processes"):
+            await run(name, args, base_url, pool)
+    finally:
+        pool.close()
+        ytdl_pool.close()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=32)
+    parser.add_argument("--size", type=int, default=8_000_000, help="bytes per track")
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""Progress hook cost: old dict + pydantic reports vs `ProgressStore`
+
+Threads stand in for yt-dlp downloads and call the hook the way yt-dlp
+does, many times per percent. The old path updates a shared dict and sets
+the asyncio event straight from the thread, the new one publishes only
+changes and wakes the loop through `call_soon_threadsafe`, usage:
+
+    python -m benchmarks.bench_progress_store --downloads 16 --calls 20000
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from app.download_manager.progress import DownloadProgressReport, ProgressStore
+from app.models.playlist import DownloadStatusEnum
+
+CHUNK_SIZE = 1024  # bytes per hook call, the store also sums transferred bytes
+
+
+def old_update(progress_reports: dict, download_id: int, percent: int) -> None:
+    current_report = progress_reports.get(
+        download_id,
+        DownloadProgressReport(track_id=download_id),
+    )
+    current_report.percent = max(current_report.percent, percent)
+    current_report.status = DownloadStatusEnum.DOWNLOADING
+    progress_reports[download_id] = current_report
+
+
+async def consume(
+    event: asyncio.Event, stop: threading.Event, on_wakeup=lambda: None
+) -> int:
+    wakeups = 0
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(event.wait(), 0.05)
+        except asyncio.TimeoutError:
+            continue
+        event.clear()
+        on_wakeup()
+        wakeups += 1
+    return wakeups
+
+
+async def run(name: str, args: argparse.Namespace) -> None:
+    store = ProgressStore()
+    progress_reports: dict = {}
+    subscriber = store.subscribe()
+    event = subscriber.event if name == "store" else asyncio.Event()
+
+    def hook_thread(download_id: int) -> None:
+        for call in range(args.calls):
+            percent = call * 100 // args.calls
+            if name == "store":
+                store.update(
+                    download_id,
+                    download_id,
+                    percent,
+                    DownloadStatusEnum.DOWNLOADING,
+                    downloaded_bytes=call * CHUNK_SIZE,
+                    total_bytes=args.calls * CHUNK_SIZE,
+                )
+            else:
+                old_update(progress_reports, download_id, percent)
+                event.set()
+
+    stop = threading.Event()
+    consumer = asyncio.create_task(
+        consume(event, stop, lambda: store.next_message(subscriber))
+    )
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(
+        *(asyncio.to_thread(hook_thread, i) for i in range(args.downloads))
+    )
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    stop.set()
+    wakeups = await consumer
+    calls = args.downloads * args.calls
+    published = store.stats.published if name == "store" else calls
+    print(
+        f"{name:>6} {wall:>8.2f} {cpu:>8.2f} {calls / wall:>12.0f} "
+        f"{published:>10} {wakeups:>8}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"downloads={args.downloads} calls per download={args.calls}")
+    print(
+        f"{'path':>6} {'wall s':>8} {'cpu s':>8} {'calls/s':>12} "
+        f"{'published':>10} {'wakeups':>8}"
+    )
+    for name in ("old", "store"):
+        await run(name, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--downloads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
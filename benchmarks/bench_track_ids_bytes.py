@@ -0,0 +1,58 @@
+"""Bytes transferred to list a playlist's track IDs, api-v2 stubs vs page scraping
+
+Talks to the real SoundCloud with the settings from `.env`, usage:
+
+    python -m benchmarks.bench_track_ids_bytes --id 123456 \
+        --url https://soundcloud.com/user/sets/name
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core import config
+from app.soundcloud import api
+from app.soundcloud.client import SoundCloudClient
+from app.soundcloud.playlist import (
+    get_playlist_page_tracks_ids,
+    get_playlist_tracks_ids,
+)
+
+
+async def main(playlist_id: str, playlist_uri: str) -> None:
+    # a cached body or a 304 revalidation would under-report the api path
+    config.settings.http_cache_ttls = {}
+    sc_client = SoundCloudClient()
+    session = await sc_client.get_session(None)
+    sc_auth = await sc_client.get_auth(None)
+
+    print(f"{'path':>8} {'ids':>6} {'KiB':>9} {'seconds':>8}")
+    for name, endpoint, resolve in (
+        (
+            "api",
+            "/playlists/{id}",
+            get_playlist_tracks_ids(playlist_id, session, sc_auth, playlist_uri),
+        ),
+        (
+            "scrape",
+            "playlist-page",
+            get_playlist_page_tracks_ids(playlist_uri, session),
+        ),
+    ):
+        stats = api.endpoint_stats.setdefault(endpoint, api.EndpointStats())
+        received = stats.bytes_received
+        started = time.perf_counter()
+        tracks_ids = await resolve
+        elapsed = time.perf_counter() - started
+        size = (stats.bytes_received - received) / 1024
+        print(f"{name:>8} {len(tracks_ids):>6} {size:>9.1f} {elapsed:>8.3f}")
+
+    await sc_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--id", required=True, help="playlist platform_id")
+    parser.add_argument("--url", required=True, help="playlist permalink url")
+    args = parser.parse_args()
+    asyncio.run(main(args.id, args.url))
@@ -0,0 +1,84 @@
+"""Wall-clock time of `get_playlist_tracks` versus batch concurrency
+
+Runs a local fake api-v2 with a fixed per-request latency, usage:
+
+    python -m benchmarks.bench_tracks_hydration --tracks 3000 --latency 0.08
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiohttp import ClientSession, web
+
+from app.core import config
+from app.soundcloud.auth import SoundCloudAuth
+from app.soundcloud import api, playlist
+
+
+def fake_api(total_tracks: int, latency: float) -> web.Application:
+    async def playlist_stubs(request: web.Request) -> web.Response:
+        stubs = [{"id": i, "kind": "track"} for i in range(total_tracks)]
+        return web.json_response({"track_count": total_tracks, "tracks": stubs})
+
+    async def tracks(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        ids = request.query["ids"].split(",")
+        # upstream does not keep the requested order
+        return web.json_response(
+            [
+                {
+                    "id": int(i),
+                    "title": f"track {i}",
+                    "permalink_url": f"https://soundcloud.com/fake/{i}",
+                    "duration": 1000,
+                    "user": {"full_name": "fake"},
+                }
+                for i in reversed(ids)
+            ]
+        )
+
+    app = web.Application()
+    app.router.add_get("/playlists/{id}", playlist_stubs)
+    app.router.add_get("/tracks", tracks)
+    return app
+
+
+async def main(total_tracks: int, latency: float, levels: list[int]) -> None:
+    runner = web.AppRunner(fake_api(total_tracks, latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    base_url = f"http://127.0.0.1:{port}"
+    config.settings.soundcloud_api_url = base_url
+    # measure batch concurrency, not the shared SoundCloud rate limit
+    api.rate_limiter.max_rate = api.rate_limiter.rate = 10_000
+    api.rate_limiter.burst = 10_000
+    # every level must hit the fake api, not `BASE_DIR/http_cache.db`
+    config.settings.http_cache_ttls = {}
+
+    sc_auth = SoundCloudAuth(app_version="1", client_id="bench", expires_at=1e12)
+    print(f"tracks={total_tracks} latency={latency * 1000:.0f}ms")
+    print(f"{'concurrency':>12} {'seconds':>10} {'tracks':>8}")
+    async with ClientSession() as session:
+        for concurrency in levels:
+            started = time.perf_counter()
+            result = await playlist.get_playlist_tracks(
+                "1", session, sc_auth, concurrency=concurrency
+            )
+            elapsed = time.perf_counter() - started
+            assert [obj.platform_id for obj in result] == [
+                str(i) for i in range(total_tracks)
+            ]
+            print(f"{concurrency:>12} {elapsed:>10.3f} {len(result):>8}")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.08)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.latency, args.levels))
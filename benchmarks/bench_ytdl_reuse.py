@@ -0,0 +1,94 @@
+"""Per-track extraction vs transfer time, fresh YoutubeDL vs `YtdlPool`
+
+Serves generated files from a local HTTP server (the generic extractor
+downloads them), so it measures yt-dlp overhead rather than SoundCloud,
+usage:
+
+    python -m benchmarks.bench_ytdl_reuse --tracks 20 --size 2000000
+"""
+
+import argparse
+import functools
+import http.server
+import os
+import tempfile
+import threading
+import time
+
+import yt_dlp
+
+from app.core import config
+from app.soundcloud.download import YtdlPool
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # the generic extractor drops its probe request mid-body
+        pass
+
+
+def serve(folder: str) -> tuple[http.server.ThreadingHTTPServer, str]:
+    handler = functools.partial(QuietHandler, directory=folder)
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fresh(urls: list[str], params) -> tuple[float, float]:
+    extract = transfer = 0.0
+    for url in urls:
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL(params) as ydl:
+            info = ydl.extract_info(url, download=False)
+            extracted = time.perf_counter()
+            ydl.process_ie_result(info, download=True)  # type: ignore
+        extract += extracted - started
+        transfer += time.perf_counter() - extracted
+    return extract, transfer
+
+
+def pooled(urls: list[str], params) -> tuple[float, float]:
+    pool = YtdlPool(info_ttl=300, info_cache_size=len(urls), max_idle=1)
+    for url in urls:
+        pool.download(url, params, lambda dtl: None)
+    pool.close()
+    return pool.stats.extract_seconds, pool.stats.transfer_seconds
+
+
+def main(tracks: int, size: int) -> None:
+    media = tempfile.mkdtemp()
+    for i in range(tracks):
+        with open(os.path.join(media, f"track-{i}.mp3"), "wb") as file:
+            file.write(os.urandom(size))
+    server, base_url = serve(media)
+
+    print(f"tracks={tracks} size={size / 1024 / 1024:.1f} MiB")
+    print(f"{'path':>7} {'extract ms/track':>17} {'transfer ms/track':>18}")
+    for name, run in (("fresh", fresh), ("pool", pooled)):
+        params = dict(
+            config.ydl_opts,
+            outtmpl=os.path.join(tempfile.mkdtemp(), "%(title)s.%(ext)s"),
+            quiet=True,
+            noprogress=True,
+            proxy=None,
+        )
+        urls = [f"{base_url}/track-{i}.mp3" for i in range(tracks)]
+        extract, transfer = run(urls, params)
+        print(
+            f"{name:>7} {extract / tracks * 1000:>17.1f} "
+            f"{transfer / tracks * 1000:>18.1f}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--size", type=int, default=2_000_000, help="bytes per file")
+    args = parser.parse_args()
+    main(args.tracks, args.size)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.download_manager.playlist_index import playlist_index
+from app.download_manager.progress import ProgressStore
+from app.models.playlist import DownloadStatusEnum
+
+DOWNLOAD_ID = 1
+TRACK_ID = 10
+PLAYLIST_ID = 100
+
+
+@pytest.fixture
+def store():
+    # the store hands changes to the loop it was created on
+    loop = asyncio.new_event_loop()
+    playlist_index.link(PLAYLIST_ID, [TRACK_ID])
+    try:
+        yield loop.run_until_complete(create_store())
+    finally:
+        playlist_index.unlink(PLAYLIST_ID, [TRACK_ID])
+        loop.close()
+
+
+async def create_store() -> ProgressStore:
+    return ProgressStore()
+
+
+def finish(store: ProgressStore, status: DownloadStatusEnum) -> None:
+    store.update(DOWNLOAD_ID, TRACK_ID, 0, DownloadStatusEnum.DOWNLOADING)
+    store.update(
+        DOWNLOAD_ID, TRACK_ID, 100, status, downloaded_bytes=1000, total_bytes=1000
+    )
+    store.finished_ttl = 0
+    store.evict()
+    store.finished_ttl = 300
+    assert store.get(DOWNLOAD_ID) is None
+
+
+@pytest.mark.parametrize("playlist_id", [None, PLAYLIST_ID])
+def test_evicted_downloads_stay_counted(store, playlist_id):
+    finish(store, DownloadStatusEnum.SUCCESSFUL)
+
+    summary = store.summary(playlist_id)
+    assert (summary.downloads, summary.completed) == (1, 1)
+    assert summary.bytes_done == 1000
+
+
+@pytest.mark.parametrize("playlist_id", [None, PLAYLIST_ID])
+def test_retry_after_eviction_is_counted_once(store, playlist_id):
+    finish(store, DownloadStatusEnum.FAILED)
+    assert store.summary(playlist_id).failed == 1
+
+    store.update(DOWNLOAD_ID, TRACK_ID, 0, DownloadStatusEnum.DOWNLOADING)
+    summary = store.summary(playlist_id)
+    assert (summary.downloads, summary.running, summary.failed) == (1, 1, 0)
+    assert summary.bytes_done == 0
+
+    store.update(
+        DOWNLOAD_ID,
+        TRACK_ID,
+        100,
+        DownloadStatusEnum.SUCCESSFUL,
+        downloaded_bytes=1000,
+        total_bytes=1000,
+    )
+    summary = store.summary(playlist_id)
+    assert (summary.downloads, summary.running, summary.completed) == (1, 0, 1)
+    assert summary.bytes_done == 1000
+
+
+def test_readded_after_eviction_is_counted_once(store):
+    finish(store, DownloadStatusEnum.SUCCESSFUL)
+    finish(store, DownloadStatusEnum.SUCCESSFUL)
+
+    summary = store.summary()
+    assert (summary.downloads, summary.completed) == (1, 1)
+    assert summary.bytes_done == 1000